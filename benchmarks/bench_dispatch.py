@@ -0,0 +1,56 @@
+"""
+Measures import time of the package and the cost of resource managers dispatch.
+
+Dispatch is measured with cached managers and with the uncached baseline, where the cache is cleared before each
+call, so the resource name is parsed, its class is looked up and version checked and a manager is built again:
+
+    $ python benchmarks/bench_dispatch.py --number 200000 --imports 10
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from facepplib import FacePP  # noqa: E402
+
+
+def import_time(imports):
+    """
+    Returns the best wall clock time of importing the package in a fresh interpreter, without interpreter startup.
+    """
+    code = 'import time; started = time.time(); import facepplib; print(time.time() - started)'
+    return min(float(subprocess.check_output([sys.executable, '-c', code], cwd=ROOT)) for _ in range(imports))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=100000, help='number of dispatches per measurement')
+    parser.add_argument('--imports', type=int, default=5, help='number of package imports to take the best of')
+    args = parser.parse_args()
+
+    facepp = FacePP('key', 'secret', url='https://api-us.faceplusplus.com', version='3.0')
+    manager = facepp.image
+    image = manager.to_resource({'image_id': 'a0', 'faces': [{'face_token': 'f0'}]})
+
+    print('{0:<32} {1:>12.1f} ms'.format('import facepplib', import_time(args.imports) * 1e3))
+    print('{0:<32} {1:>12} {2:>12} {3:>8}'.format('dispatch, ns/op', 'cached', 'uncached', 'speedup'))
+
+    def uncached(statement):
+        return lambda: (facepp._managers.clear(), statement())
+
+    for name, statement in (('facepp.face_set', lambda: facepp.face_set),
+                            ('manager.new_manager(FaceSet)', lambda: manager.new_manager('FaceSet')),
+                            ('image.faces (encode)', lambda: image.encode('faces', image.raw()['faces'], manager))):
+        cached = timeit.timeit(statement, number=args.number) / args.number
+        baseline = timeit.timeit(uncached(statement), number=args.number) / args.number
+        print('{0:<32} {1:>12.1f} {2:>12.1f} {3:>7.1f}x'.format(name, cached * 1e9, baseline * 1e9, baseline / cached))
+
+if __name__ == '__main__':
+    main()
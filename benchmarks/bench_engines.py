@@ -0,0 +1,96 @@
+"""
+Compares client CPU time and latency per request of SyncEngine and LeanEngine against a local keep-alive server:
+
+    $ python benchmarks/bench_engines.py --number 2000
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from facepplib import engines  # noqa: E402
+
+content = json.dumps({'request_id': '1553841428,c9ad5e2a', 'time_used': 45, 'faces': [
+    {'face_token': 'ed319e807e039ae669a4d1af0922a0c8',
+     'face_rectangle': {'top': 1, 'left': 2, 'width': 3, 'height': 4}}]}).encode('utf-8')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def serve(port):
+    Server(('127.0.0.1', port), Handler).serve_forever()
+
+
+def cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
+def measure(engine, url, number):
+    data = {'image_url': 'https://example.com/face.jpg', 'return_attributes': 'gender,age'}
+
+    for _ in range(min(number, 50)):  # warm up the pool
+        engine.request('post', url, data=data)
+
+    cpu, wall = cpu_time(), time.time()
+    for _ in range(number):
+        engine.request('post', url, data=data)
+    return (cpu_time() - cpu) / number, (time.time() - wall) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000, help='number of requests per engine')
+    parser.add_argument('--port', type=int, default=8765, help='port of the local server')
+    args = parser.parse_args()
+
+    server = multiprocessing.Process(target=serve, args=(args.port,))
+    server.daemon = True
+    server.start()
+    time.sleep(0.5)
+
+    url = 'http://127.0.0.1:{0}/facepp/v3/detect'.format(args.port)
+    print('{0:>12} {1:>16} {2:>16}'.format('engine', 'cpu, us/req', 'wall, us/req'))
+
+    try:
+        for engine_class in (engines.SyncEngine, engines.LeanEngine):
+            cpu, wall = measure(engine_class(api_key='key', api_secret='secret'), url, args.number)
+            print('{0:>12} {1:>16.1f} {2:>16.1f}'.format(engine_class.__name__, cpu * 1e6, wall * 1e6))
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Measures the cost of Resource objects instantiation.
+
+Per-instance cost should stay flat no matter how many resources were instantiated before:
+
+    $ python benchmarks/bench_resource_init.py --total 5000000 --batch 500000
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from facepplib import managers, resources  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--total', type=int, default=2000000, help='number of resources to instantiate')
+    parser.add_argument('--batch', type=int, default=200000, help='number of resources per measurement')
+    args = parser.parse_args()
+
+    face = resources.Face
+    manager = managers.ResourceManager(None, face)
+    attributes = {'face_token': 'f149db9d57149d538f386d390d6d8c5e',
+                  'face_rectangle': {'top': 81, 'left': 147, 'width': 105, 'height': 105}}
+
+    print('{0:>12} {1:>12} {2:>16}'.format('instances', 'ns/instance', 'readonly attrs'))
+
+    for done in range(args.batch, args.total + 1, args.batch):
+        elapsed = timeit.timeit(lambda: face(manager, attributes), number=args.batch)
+        print('{0:>12} {1:>12.1f} {2:>16}'.format(
+            done, elapsed / args.batch * 1e9, len(face._create_readonly_attrs) + len(face._create_readonly)))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,9 +6,7 @@ import contextlib
 import locale
 import inspect
 
-from distutils.version import LooseVersion
-
-from . import exceptions, engines, utilities, resources
+from . import exceptions, engines, utilities, resources, tasks
 from .version import __version__
 
 
@@ -29,6 +27,26 @@ class FacePP(object):
         :type raise_attr_exception: bool or tuple
         :param cls engine: (optional). Engine that will be used to make requests to FacePP.
         :param bool return_raw_response (optional). Whether engine should return raw or json encoded responses.
+        :param int workers (optional). Max number of requests engine should run concurrently.
+        :param json_backend (optional). JSON backend name, i.e. orjson, or a callable that decodes JSON from bytes.
+        :type json_backend: string or callable
+        :param list lazy_json (optional). Keys which values are decoded on first access, i.e. ['landmark'].
+        :param mirror.FaceSetMirror mirror (optional). Local mirror of facesets that is consulted while it's fresh.
+        :param int compare_cache (optional). Max number of face pairs which compare confidence is cached.
+        :param dict task_polling (optional). Options of asynchronous tasks polling, i.e. min_interval.
+        :param timeout (optional). Default timeout of requests in seconds, either a float or (connect, read) tuple.
+        :type timeout: float or tuple
+        :param int pool_connections (optional). Number of hosts engine keeps connection pools for.
+        :param int pool_maxsize (optional). Max number of keep-alive connections engine keeps per host.
+        :param bool pool_block (optional). Whether requests should wait for a free connection if the pool is full.
+        :param int prewarm (optional). Number of keep-alive connections opened to FacePP on initialization.
+        :param instrumentation.Instrumentation instrumentation (optional). Counters and events of the engine.
+        :param image_fetch (optional). Client-side fetching of image_url inputs that FacePP fails to download in
+                           time: never, on_timeout, always or auto mode, fetch.ImageFetcher options or object.
+        :type image_fetch: string, dict or fetch.ImageFetcher
+        :param image_transport (optional). Adaptive choice between image_url, image_file and image_base64 per
+                               request: True, transport.TransportPolicy options or object.
+        :type image_transport: bool, dict or transport.TransportPolicy
         """
         self.url = kwargs.get('url', None)
         if self.url is None:
@@ -42,6 +60,9 @@ class FacePP(object):
         self.date_format = kwargs.get('date_format', '%Y-%m-%d')
         self.datetime_format = kwargs.get('datetime_format', '%Y-%m-%dT%H:%M:%SZ')
         self.raise_attr_exception = kwargs.get('raise_attr_exception', True)
+        self.mirror = kwargs.get('mirror', None)
+        self.compare_cache = utilities.LRUCache(kwargs.get('compare_cache', 10000))
+        self.task_poller = tasks.TaskPoller(self, **kwargs.get('task_polling', {}))
 
         engine = kwargs.get('engine', engines.DefaultEngine)
 
@@ -49,6 +70,10 @@ class FacePP(object):
             raise exceptions.EngineClassError
 
         self.engine = engine(api_key=api_key, api_secret=api_secret, **kwargs)
+        self._managers = {}  # managers by attribute name and FacePP version they were checked for
+
+        if kwargs.get('prewarm'):
+            self.engine.prewarm(self.url, kwargs['prewarm'])
 
     def __getattr__(self, resource_name):
         """
@@ -59,17 +84,25 @@ class FacePP(object):
         if resource_name.startswith('_'):
             raise AttributeError
 
-        resource_name = ''.join(word[0].upper() + word[1:] for word in str(resource_name).split('_'))
+        manager = self._managers.get((resource_name, self.ver))
+
+        if manager is None:
+            name = ''.join(word[0].upper() + word[1:] for word in str(resource_name).split('_'))
+
+            try:
+                resource_class = resources.registry[name]['class']
+            except KeyError:
+                raise exceptions.ResourceError
 
-        try:
-            resource_class = resources.registry[resource_name]['class']
-        except KeyError:
-            raise exceptions.ResourceError
+            if self.ver is not None and resource_class.facepp_version is not None and \
+                    utilities.parse_version(self.ver) < utilities.parse_version(resource_class.facepp_version):
+                raise exceptions.ResourceVersionMismatchError
 
-        if self.ver is not None and LooseVersion(str(self.ver)) < LooseVersion(resource_class.facepp_version):
-            raise exceptions.ResourceVersionMismatchError
+            # Managers don't hold per-call state, so a single manager serves all calls and threads
+            manager = self._managers.setdefault((resource_name, self.ver), resource_class.manager_class(
+                self, resource_class))
 
-        return resource_class.manager_class(self, resource_class)
+        return manager
 
     @classmethod
     def version(cls):
@@ -81,13 +114,11 @@ class FacePP(object):
     @contextlib.contextmanager
     def session(self, **options):
         """
-        Initiates a temporary session with a copy of the current engine but with new options.
+        Initiates a temporary session with new options. Options are layered over the current ones for the
+        current thread or asyncio task only, the engine and its connection pool are shared with other sessions.
 
-        :param dict options: (optional). Engine's options for a session.
+        :param dict options: (optional). Engine's options for a session, i.e. requests={'timeout': 5}.
         """
-        engine = self.engine
-        self.engine = engine.__class__(
-            requests=utilities.merge_dicts(engine.requests, options.pop('requests', {})), **options)
-        yield self
-        self.engine = engine
+        with self.engine.scoped(**options):
+            yield self
 
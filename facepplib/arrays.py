@@ -0,0 +1,148 @@
+"""
+Provides columnar NumPy export of resources data. NumPy is an optional dependency.
+"""
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from . import exceptions
+
+#
+# {
+#   field_name: (path to the field in resource data, column keys, dtype, missing value),
+#   ...
+# }
+#
+fields_table = {
+    'face_rectangle': (('face_rectangle',), ('top', 'left', 'width', 'height'), 'int32', -1),
+    'age': (('attributes', 'age'), ('value',), 'float32', float('nan')),
+    'gender': (('attributes', 'gender'), ('value',), 'int8', -1),
+    'smile': (('attributes', 'smile'), ('value',), 'float32', float('nan')),
+    'headpose': (('attributes', 'headpose'), ('pitch_angle', 'roll_angle', 'yaw_angle'), 'float32', float('nan')),
+    'blur': (('attributes', 'blur', 'blurness'), ('value',), 'float32', float('nan')),
+    'facequality': (('attributes', 'facequality'), ('value',), 'float32', float('nan')),
+    'emotion': (('attributes', 'emotion'),
+                ('anger', 'disgust', 'fear', 'happiness', 'neutral', 'sadness', 'surprise'), 'float32', float('nan')),
+    'beauty': (('attributes', 'beauty'), ('male_score', 'female_score'), 'float32', float('nan')),
+    'mouthstatus': (('attributes', 'mouthstatus'),
+                    ('surgical_mask_or_respirator', 'other_occlusion', 'close', 'open'), 'float32', float('nan')),
+    'skinstatus': (('attributes', 'skinstatus'), ('health', 'stain', 'acne', 'dark_circle'), 'float32', float('nan')),
+}
+
+# Categorical values that are stored as integer codes
+codes_table = {
+    'gender': {'Female': 0, 'Male': 1}
+}
+
+
+def matrix(rows):
+    """
+    Returns a float32 array of a list of lists of numbers, None values are stored as NaN.
+
+    :param list rows: (required). List of lists of numbers.
+    """
+    if numpy is None:
+        raise exceptions.OptionalDependencyError('numpy')
+
+    return numpy.array([[numpy.nan if value is None else value for value in row] for row in rows],
+                       dtype=numpy.float32).reshape(len(rows), len(rows[0]) if rows else 0)
+
+
+class FaceFrame(object):
+    """
+    Columnar representation of faces data, each field is stored as a contiguous NumPy array
+    with one row per face, i.e. face_rectangle is an (n, 4) int32 array.
+    """
+    def __init__(self, face_tokens, arrays):
+        """
+        :param list face_tokens: (required). Face tokens in the order of array rows.
+        :param dict arrays: (required). NumPy arrays by field name.
+        """
+        self.face_tokens = face_tokens
+        self.arrays = arrays
+
+    @classmethod
+    def from_resources(cls, resources, fields, id_key='face_token'):
+        """
+        Builds FaceFrame from resources data as it was received from FacePP in a single pass.
+
+        :param list resources: (required). Resources data.
+        :param fields: (required). Field names to export, i.e. ['face_rectangle', 'age'].
+        :type fields: list or tuple
+        :param string id_key: (optional). Resource id key.
+        """
+        if numpy is None:
+            raise exceptions.OptionalDependencyError('numpy')
+
+        for field in fields:
+            if field not in fields_table:
+                raise exceptions.ValidationError('{0} field can not be exported to an array'.format(field))
+
+        size = len(resources)
+        specs = [(field,) + fields_table[field] for field in fields]
+        arrays = dict((field, numpy.full((size, len(columns)) if len(columns) > 1 else size, missing, dtype=dtype))
+                      for field, path, columns, dtype, missing in specs)
+        face_tokens = []
+
+        for row, resource in enumerate(resources):
+            face_tokens.append(resource.get(id_key))
+
+            for field, path, columns, dtype, missing in specs:
+                value = resource
+                for key in path:
+                    value = value.get(key) if isinstance(value, dict) else None
+                if not value:
+                    continue
+
+                codes = codes_table.get(field)
+                values = [value.get(column) for column in columns]
+                values = [codes.get(item, missing) for item in values] if codes else values
+
+                if len(columns) > 1:
+                    arrays[field][row] = [missing if item is None else item for item in values]
+                elif values[0] is not None:
+                    arrays[field][row] = values[0]
+
+        return cls(face_tokens, arrays)
+
+    @staticmethod
+    def columns(field):
+        """
+        Returns names of the columns of the field array.
+
+        :param string field: (required). Field name.
+        """
+        return fields_table[field][1]
+
+    def keys(self):
+        """
+        Returns names of the exported fields.
+        """
+        return self.arrays.keys()
+
+    def __getitem__(self, field):
+        """
+        Returns an array of the requested field.
+        """
+        return self.arrays[field]
+
+    def __contains__(self, field):
+        """
+        Checks whether the field was exported.
+        """
+        return field in self.arrays
+
+    def __len__(self):
+        """
+        Allows len() to be called on a FaceFrame object.
+        """
+        return len(self.face_tokens)
+
+    def __repr__(self):
+        """
+        Official representation of a FaceFrame object.
+        """
+        return '<facepplib.arrays.FaceFrame object with {0} faces and fields: {1}>'.format(
+            len(self), ', '.join(sorted(self.arrays)))
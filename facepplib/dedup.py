@@ -0,0 +1,367 @@
+"""
+Provides deduplication of identities across a photo collection with pruning of compare requests.
+"""
+
+import collections
+import math
+import threading
+import uuid
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:  # Python 2
+    from urlparse import urlsplit
+
+from . import instrumentation, sharding
+from .managers.facial import largest_face
+
+
+class UnionFind(object):
+    """
+    Disjoint sets of items that are merged incrementally.
+    """
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def add(self, item):
+        """
+        Adds item as a set of its own if it isn't added yet.
+
+        :param any item: (required). Item.
+        """
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item):
+        """
+        Returns representative item of the set the item belongs to.
+
+        :param any item: (required). Item.
+        """
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        """
+        Merges sets of both items.
+
+        :param any a: (required). Item.
+        :param any b: (required). Item.
+        """
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def groups(self):
+        """
+        Returns a list of sets as lists of items in the order they were added.
+        """
+        groups = collections.OrderedDict()
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+
+class Deduplicator(object):
+    """
+    Finds photos of the same identity in a collection without comparing every pair of photos. Faces are split
+    into blocks by cheap detect attributes and only faces of the same block are matched. Small blocks are
+    compared pair by pair, large blocks are put in a temporary faceset and each face is searched in it to get
+    a few candidates, which are then confirmed with compare. Photos are clustered incrementally, so the
+    collection can be processed in batches. A failed detect, search or compare doesn't abort the batch, it's
+    recorded in the report and the image or pair is left unmatched.
+    """
+    chunk = 5  # Max number of face tokens FacePP accepts in a single addface request
+
+    def __init__(self, facepp, threshold='1e-4', candidate_threshold='1e-3', candidates=5, blocking=('gender',),
+                 age_band=10, confirm=True):
+        """
+        :param facepp.FacePP facepp: (required). FacePP object.
+        :param threshold: (optional). Confidence of the same identity, either a float or a key of the
+                          thresholds returned by FacePP, i.e. 1e-4.
+        :type threshold: float or string
+        :param candidate_threshold: (optional). Min search confidence of a candidate, float or thresholds key.
+        :type candidate_threshold: float or string
+        :param int candidates: (optional). Number of candidates searched per face, up to 5.
+        :param tuple blocking: (optional). Attributes faces are blocked on: gender, age and size.
+        :param int age_band: (optional). Width of age bands in years if faces are blocked on age.
+        :param bool confirm: (optional). Whether candidates should be confirmed with compare.
+        """
+        self.facepp = facepp
+        self.threshold = threshold
+        self.candidate_threshold = candidate_threshold
+        self.candidates = min(candidates, 5)
+        self.blocking = tuple(blocking)
+        self.age_band = age_band
+        self.confirm = confirm
+
+        self.images = []
+        self.faces = {}  # image index: face data
+        self.blocks = collections.OrderedDict()  # block key: list of image indexes
+        self.facesets = {}  # block key: (VirtualFaceSet, set of image indexes added to it)
+        self.clusters = UnionFind()
+        self.failed_images = {}  # image index: exception of its detect or search
+        self.failed_pairs = {}  # (image index, image index): exception of their compare
+        self.calls = collections.Counter()
+        self.lock = threading.Lock()
+        self.instrumentation = instrumentation.Instrumentation(facepp.engine.instrumentation)
+        self.instrumentation.subscribe('request', self._count)
+        self.thresholds = None
+        self.prefix = 'facepp-dedup-{0}'.format(uuid.uuid4().hex[:12])
+
+    def _count(self, event, data):
+        """
+        Counts a request the engine made for the deduplicator by the last part of its API path, i.e. compare.
+
+        :param string event: (required). Event name.
+        :param dict data: (required). Event data.
+        """
+        with self.lock:
+            self.calls[urlsplit(data['url']).path.rsplit('/', 1)[-1]] += 1
+
+    def _session(self):
+        """
+        Returns a context manager in which requests made by the engine are counted by the deduplicator.
+        """
+        return self.facepp.engine.scoped(instrumentation=self.instrumentation)
+
+    def _request(self, path, **data):
+        """
+        Makes a request to FacePP and remembers thresholds returned by FacePP.
+
+        :param string path: (required). API path, i.e. /facepp/v3/compare.
+        :param dict data: (optional). Request data.
+        """
+        response = self.facepp.engine.request('post', self.facepp.url + path, data=data)
+        if self.thresholds is None and response.get('thresholds'):
+            self.thresholds = response['thresholds']
+        return response
+
+    def _threshold(self, threshold, pair=None):
+        """
+        Returns numeric threshold, thresholds key is resolved with thresholds returned by FacePP.
+
+        :param threshold: (required). Threshold as a float or thresholds key.
+        :type threshold: float or string
+        :param tuple pair: (optional). Image indexes compared to get thresholds if they aren't known yet.
+        """
+        if isinstance(threshold, (int, float)):
+            return threshold
+        if self.thresholds is None and pair is not None:
+            # Confidences were all cached, thresholds are requested with a compare of a known pair
+            self._request('/facepp/v3/compare', face_token1=self.faces[pair[0]]['face_token'],
+                          face_token2=self.faces[pair[1]]['face_token'])
+        return self.thresholds[threshold]
+
+    def _block(self, face):
+        """
+        Returns block key of the face.
+
+        :param dict face: (required). Face data as it was received from FacePP.
+        """
+        attributes = face.get('attributes') or {}
+        key = []
+
+        for name in self.blocking:
+            if name == 'gender':
+                key.append((attributes.get('gender') or {}).get('value'))
+            elif name == 'age':
+                age = (attributes.get('age') or {}).get('value')
+                key.append(None if age is None else age // self.age_band)
+            elif name == 'size':
+                width = face['face_rectangle']['width']
+                key.append(int(math.log(width, 2)) if width > 0 else 0)
+
+        return tuple(key)
+
+    def _detect(self, image):
+        """
+        Detects faces on the image with blocking attributes and returns the largest face or None.
+
+        :param dict image: (required). Image params, i.e. {'image_url': ...}.
+        """
+        attributes = [name for name in self.blocking if name in ('gender', 'age')]
+        faces = self._request('/facepp/v3/detect', return_attributes=','.join(attributes) or 'none',
+                              **image).get('faces')
+        return largest_face(faces) if faces else None
+
+    def _compare(self, a, b):
+        """
+        Returns compare confidence of faces of both images, confidences are cached per FacePP object.
+
+        :param int a: (required). Image index.
+        :param int b: (required). Image index.
+        """
+        tokens = (self.faces[a]['face_token'], self.faces[b]['face_token'])
+        confidence = self.facepp.compare_cache.get(frozenset(tokens))
+
+        if confidence is None:
+            confidence = self._request('/facepp/v3/compare', face_token1=tokens[0], face_token2=tokens[1])['confidence']
+            self.facepp.compare_cache.set(frozenset(tokens), confidence)
+
+        return confidence
+
+    def _faceset(self, key):
+        """
+        Returns a temporary virtual faceset of the block and a set of image indexes added to it.
+
+        :param tuple key: (required). Block key.
+        """
+        if key not in self.facesets:
+            faceset = sharding.VirtualFaceSet(self.facepp, '{0}-{1}'.format(
+                self.prefix, len(self.facesets)), display_name='facepp dedup')
+            faceset.counts = {}  # faceset is new, there are no shards to discover
+            self.facesets[key] = (faceset, set())
+        return self.facesets[key]
+
+    def _search(self, key, indexes):
+        """
+        Returns candidate pairs of the images found by searching their faces in the temporary faceset of the block.
+
+        :param tuple key: (required). Block key.
+        :param list indexes: (required). Indexes of images to search.
+        """
+        faceset, added = self._faceset(key)
+        missing = [index for index in self.blocks[key] if index not in added]
+
+        faceset.add_faces([self.faces[index]['face_token'] for index in missing])
+        added.update(missing)
+
+        images = dict((self.faces[index]['face_token'], index) for index in self.blocks[key])
+
+        def search(index):
+            return faceset.search(face_token=self.faces[index]['face_token'], return_result_count=self.candidates + 1)
+
+        pairs = {}
+
+        for index, (found, error) in zip(indexes, self.facepp.engine.settle(search, indexes)):
+            if error is not None:
+                self.failed_images[index] = error
+                continue
+            if self.thresholds is None:
+                self.thresholds = found.thresholds
+            for result in found.raw()['results']:
+                other = images.get(result['face_token'])
+                if other is not None and other != index:
+                    pairs[tuple(sorted((index, other)))] = result['confidence']
+
+        return pairs
+
+    def add(self, images):
+        """
+        Adds images to the collection and clusters them with the images added so far. Returns self.
+
+        :param list images: (required). Image params dicts, i.e. [{'image_url': ...}, {'image_file': ...}].
+        """
+        with self._session():
+            self._add(list(images))
+
+        return self
+
+    def _add(self, images):
+        """
+        Detects, blocks and matches images and merges clusters of the matched ones.
+
+        :param list images: (required). Image params dicts.
+        """
+        start = len(self.images)
+        self.images.extend(images)
+
+        new = collections.OrderedDict()
+
+        for index, (face, error) in enumerate(self.facepp.engine.settle(self._detect, images), start):
+            self.clusters.add(index)
+            if error is not None:
+                self.failed_images[index] = error
+            elif face is not None:
+                self.faces[index] = face
+                key = self._block(face)
+                self.blocks.setdefault(key, []).append(index)
+                new.setdefault(key, []).append(index)
+
+        compared, candidates = [], {}
+
+        for key, indexes in new.items():
+            old = len(self.blocks[key]) - len(indexes)
+            pairs = len(indexes) * old + len(indexes) * (len(indexes) - 1) // 2
+
+            # Search needs a request per new face plus adding faces that aren't in the block faceset yet
+            faceset = self.facesets.get(key)
+            missing = len(self.blocks[key]) - (len(faceset[1]) if faceset else 0)
+            searches = len(indexes) + int(math.ceil(missing / float(self.chunk))) + (0 if faceset else 1)
+
+            if pairs <= searches:
+                compared.extend((a, b) for position, b in enumerate(indexes, old)
+                                for a in self.blocks[key][:position])
+            else:
+                candidates.update(self._search(key, indexes))
+
+        candidate_threshold = self._threshold(self.candidate_threshold) if candidates else None
+        candidates = [pair for pair, confidence in candidates.items() if confidence >= candidate_threshold]
+
+        if self.confirm:
+            compared.extend(candidates)
+            matched = []
+        else:
+            matched = candidates
+
+        confidences = {}
+
+        for pair, (confidence, error) in zip(compared, self.facepp.engine.settle(self._compare, *zip(*compared))
+                                             if compared else []):
+            if error is not None:
+                self.failed_pairs[pair] = error
+            else:
+                confidences[pair] = confidence
+
+        known = next(iter(confidences), None)
+        threshold = self._threshold(self.threshold, known) if confidences or matched else None
+        matched.extend(pair for pair, confidence in confidences.items() if confidence >= threshold)
+
+        for a, b in matched:
+            self.clusters.union(a, b)
+
+    def report(self):
+        """
+        Returns a dict with clusters of image indexes, clusters of duplicates only, number of requests made by
+        type, number of compare requests naive all pairs matching needs, number of requests saved, and errors
+        of images which detect or search failed and of pairs which compare failed.
+        """
+        clusters = self.clusters.groups()
+        naive = len(self.images) * (len(self.images) - 1) // 2
+        made = sum(count for call, count in self.calls.items() if call != 'detect')
+
+        return {
+            'clusters': clusters,
+            'duplicates': [cluster for cluster in clusters if len(cluster) > 1],
+            'calls': dict(self.calls),
+            'naive_calls': naive,
+            'saved_calls': naive - made,
+            'failed_images': dict(self.failed_images),
+            'failed_pairs': dict(self.failed_pairs)
+        }
+
+    def close(self):
+        """
+        Deletes temporary facesets.
+        """
+        with self._session():
+            for faceset, _ in self.facesets.values():
+                for outer_id in faceset.shards:
+                    self.facepp.face_set.delete(outer_id=outer_id, check_empty=0)
+
+        self.facesets = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -4,5 +4,7 @@ Defines engines for processing requests/responses to/from FacePP.
 
 from .base import BaseEngine
 from .sync import SyncEngine
+from .lean import LeanEngine
+from .http2 import HTTP2Engine
 
 DefaultEngine = SyncEngine
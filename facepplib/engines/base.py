@@ -2,15 +2,35 @@
 Base engine that defines common behaviour and settings for all engines.
 """
 
+import contextlib
 import copy
 import mimetypes
 import os
+import threading
+import time
 
-from .. import exceptions
+from concurrent import futures
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+import urllib3
+
+from .. import exceptions, fetch, instrumentation, jsonlib, transport, utilities
 
 
 class BaseEngine(object):
     chunk = 100  # Default limit is 100.
+    workers = 4  # Default number of requests to run concurrently.
+    pool_connections = 10  # Default number of hosts connection pools are kept for.
+    pool_maxsize = 10  # Default max number of connections kept per host.
+    streams = 1  # Number of requests a single connection carries at once.
+    session_options = ('return_raw_response', 'lazy_json',
+                       'instrumentation')  # Engine options that can be changed in a session.
+    request_options = ('headers', 'params', 'data', 'auth', 'cookies', 'proxies', 'verify', 'cert', 'stream',
+                       'timeout', 'allow_redirects')  # Connection options that can be changed in a session.
 
     def __init__(self, api_key, api_secret, **options):
         """
@@ -18,17 +38,54 @@ class BaseEngine(object):
         :param string api_secret: (required). Your registered API Secret to call API.
         :param dict requests: (optional). Connection options.
         :param bool return_raw_response (optional). Whether to return raw or json encoded responses.
+        :param int workers (optional). Max number of requests to run concurrently.
+        :param json_backend (optional). JSON backend name, i.e. orjson, or a callable that decodes JSON from bytes.
+        :type json_backend: string or callable
+        :param list lazy_json (optional). Keys which values are decoded on first access, i.e. ['landmark'].
+        :param timeout (optional). Default timeout of requests in seconds, either a float or (connect, read) tuple.
+        :type timeout: float or tuple
+        :param instrumentation.Instrumentation instrumentation (optional). Counters and events of the engine.
+        :param int pool_connections: (optional). Number of hosts connection pools are kept for.
+        :param int pool_maxsize: (optional). Max number of keep-alive connections kept per host, defaults to
+                                 the number of workers if it's larger than the default.
+        :param bool pool_block: (optional). Whether requests should wait for a free connection if the pool is
+                                full instead of opening a connection that is discarded afterwards.
+        :param image_fetch: (optional). Client-side fetching of image_url inputs: a mode, i.e. on_timeout,
+                            fetch.ImageFetcher options or object.
+        :type image_fetch: string, dict or fetch.ImageFetcher
+        :param image_transport: (optional). Adaptive choice of the form images are sent in: True,
+                                transport.TransportPolicy options or object.
+        :type image_transport: bool, dict or transport.TransportPolicy
         """
         self.api_key = api_key
         self.api_secret = api_secret
 
         self.return_raw_response = options.pop('return_raw_response', False)
+        self.workers = options.pop('workers', self.workers)
+        self.json_loads = jsonlib.get_loads(options.pop('json_backend', None))
+        self.lazy_json = options.pop('lazy_json', None)
+        self.timeout = options.pop('timeout', None)
+        self._instrumentation = options.pop('instrumentation', None) or instrumentation.Instrumentation()
+        self.pool_connections = options.pop('pool_connections', self.pool_connections)
+        self.pool_maxsize = options.pop('pool_maxsize', max(self.pool_maxsize, self.workers))
+        self.pool_block = options.pop('pool_block', False)
+        self.fetcher = fetch.ImageFetcher.from_option(options.pop('image_fetch', None))
+        self.transport_policy = transport.TransportPolicy.from_option(options.pop('image_transport', None))
+        if self.transport_policy is not None and self.transport_policy.fetcher is None:
+            # URL inputs the policy uploads share the pool and cache of the engine fetcher
+            self.transport_policy.fetcher = self.fetcher or fetch.ImageFetcher()
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+        self._layer = utilities.ContextLocal('facepp_session')
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
 
         self.requests = dict(dict(headers={}, params={}, data={}), **options.get('requests', {}))
         self.session = self.create_session(**self.requests)
 
-    @staticmethod
-    def create_session(**params):
+    def create_session(self, **params):
         """
         Creates a session object that will be used to make requests to FacePP.
 
@@ -36,6 +93,117 @@ class BaseEngine(object):
         """
         raise NotImplementedError
 
+    @contextlib.contextmanager
+    def scoped(self, **options):
+        """
+        Layers options over the engine options for the current asyncio task or thread until the block exits.
+        Layers nest, requests the engine runs concurrently for the block see them too, other threads don't,
+        and the session with its connection pool is kept. Connection options that can't be set per request,
+        i.e. max_redirects or trust_env of requests session, get a new session for the block.
+
+        :param dict requests: (optional). Connection options, i.e. headers, timeout or proxies.
+        :param bool return_raw_response (optional). Whether to return raw or json encoded responses.
+        :param list lazy_json (optional). Keys which values are decoded on first access, i.e. ['landmark'].
+        :param instrumentation.Instrumentation instrumentation (optional). Counters and events of requests made
+                                                                 in the session, give it the engine instrumentation
+                                                                 as a parent to keep counting them there too.
+        """
+        connection = options.pop('requests', {})
+        unknown = [name for name in options if name not in self.session_options]
+
+        if unknown:
+            raise exceptions.ValidationError('{0} can\'t be changed in a session'.format(', '.join(sorted(unknown))))
+
+        layer = self._layer.get() or {'requests': {}, 'session_params': {}}
+        merged = {'requests': dict(layer['requests']), 'session_params': dict(layer['session_params'])}
+
+        for name, value in connection.items():
+            target = merged['requests' if name in self.request_options else 'session_params']
+            if isinstance(value, dict) and isinstance(target.get(name), dict):
+                value = dict(target[name], **value)
+            target[name] = value
+
+        session = None
+        if any(name not in self.request_options for name in connection):
+            session = self.create_session(**dict(self.requests, **merged['session_params']))
+            merged['session'] = session
+
+        token = self._layer.set(dict(layer, **dict(merged, **options)))
+
+        try:
+            yield self
+        finally:
+            self._layer.reset(token)
+            if session is not None and hasattr(session, 'close'):
+                session.close()
+
+    @property
+    def session(self):
+        """
+        Returns session object requests are made with in the current session layer.
+        """
+        layer = self._layer.get()
+        return layer['session'] if layer is not None and 'session' in layer else self._session
+
+    @session.setter
+    def session(self, session):
+        """
+        Sets session object of the engine.
+
+        :param any session: (required). Session object returned by create_session().
+        """
+        self._session = session
+
+    def _option(self, name):
+        """
+        Returns value of the engine option in the current session layer.
+
+        :param string name: (required). Option name, i.e. return_raw_response.
+        """
+        layer = self._layer.get()
+        return layer[name] if layer is not None and name in layer else getattr(self, name)
+
+    @property
+    def instrumentation(self):
+        """
+        Returns counters and events of the engine in the current session layer.
+        """
+        layer = self._layer.get()
+        return layer['instrumentation'] if layer is not None and 'instrumentation' in layer else self._instrumentation
+
+    def _bind(self, fn):
+        """
+        Returns a callable that calls fn in session layer of the current context, so it can be run by another thread.
+
+        :param fn: (required). Callable.
+        """
+        layer = self._layer.get()
+
+        def bound(*args):
+            token = self._layer.set(layer)
+            try:
+                return fn(*args)
+            finally:
+                self._layer.reset(token)
+
+        return bound
+
+    @staticmethod
+    def apply_session_layer(kwargs, options):
+        """
+        Applies connection options of a session layer to kwargs of a request, values of the request take precedence.
+
+        :param dict kwargs: (required). Request kwargs constructed by construct_request_kwargs().
+        :param dict options: (required). Connection options of a session layer.
+        """
+        for name, value in options.items():
+            if name in ('headers', 'params', 'data'):
+                if isinstance(kwargs.get(name), dict):
+                    kwargs[name] = dict(value, **kwargs[name])
+            else:
+                kwargs[name] = value
+        return kwargs
+
     @staticmethod
     def construct_request_kwargs(method, headers, params, data):
         """
@@ -56,6 +224,10 @@ class BaseEngine(object):
                 if not img.startswith('image_file'):
                     continue
                 image_file = kwargs['data'][img]
+                if isinstance(image_file, tuple):  # (file name, file-like object, mime type), i.e. a fetched image
+                    kwargs['files'].setdefault(img, image_file)
+                    changes.append(img)
+                    continue
                 fn = os.path.basename(image_file)
                 fp = open(image_file, 'rb')
                 ft = mimetypes.guess_type(image_file)[0] or 'application/octet-stream'
@@ -103,51 +275,352 @@ class BaseEngine(object):
             data_cp.setdefault('api_key', self.api_key)
             data_cp.setdefault('api_secret', self.api_secret)
 
-        kwargs = self.construct_request_kwargs(method, headers, params, data_cp)
-        response = self.session.request(method, url, **kwargs)
-        self.destroy_request_kwargs(method, **kwargs)
+            if self.transport_policy is not None:
+                return self.transport_policy.request(self, method, url, headers, params, data_cp)
+
+            return self._request_images(method, url, headers, params, data_cp)
+
+        return self._request(method, url, headers, params, data_cp)
+
+    def _request_images(self, method, url, headers, params, data):
+        """
+        Makes a single request to FacePP, image_url inputs are handled by the image fetcher if there's one.
+
+        :param string method: (required). HTTP verb to use for the request.
+        :param string url: (required). URL of the request.
+        :param dict headers: (required). HTTP headers to send with the request.
+        :param dict params: (required). Params to send in the query string.
+        :param dict data: (required). Request data with api key and secret.
+        """
+        if self.fetcher is not None:
+            return self.fetcher.request(self, method, url, headers, params, data)
+        return self._request(method, url, headers, params, data)
+
+    def _request(self, method, url, headers, params, data):
+        """
+        Makes a single request to FacePP with data that is ready to be sent and returns processed response.
+
+        :param string method: (required). HTTP verb to use for the request.
+        :param string url: (required). URL of the request.
+        :param dict headers: (required). HTTP headers to send with the request.
+        :param dict params: (required). Params to send in the query string.
+        :param data: (required). Data to send in the body of the request.
+        :type data: dict, bytes or file-like object
+        """
+        kwargs = self.construct_request_kwargs(method, headers, params, data)
+        layer = self._layer.get()
+        if layer is not None:
+            self.apply_session_layer(kwargs, layer['requests'])
+        if self.timeout is not None:
+            kwargs.setdefault('timeout', self.timeout)
+
+        self._enter_pool()
+        started = time.time()
+
+        try:
+            response = self.send(method, url, **kwargs)
+        except Exception as e:
+            self.instrumentation.emit('request.error', method=method, url=url, error=e)
+            raise
+        finally:
+            self._exit_pool()
+            self.destroy_request_kwargs(method, **kwargs)
+
+        elapsed = time.time() - started
+        self.instrumentation.count('request.time', elapsed)
+        self.instrumentation.emit('request', method=method, url=url, status=response.status_code, elapsed=elapsed)
         return self.process_response(response)
 
-    def bulk_request(self, method, url, container, **data):
+    def send(self, method, url, **kwargs):
         """
-        Makes needed preparations before launching the active engine's request process.
+        Sends a request constructed by construct_request_kwargs() and returns a response object.
+
+        :param string method: (required). HTTP verb to use for the request.
+        :param string url: (required). URL of the request.
+        :param dict kwargs: (optional). Request kwargs, i.e. data, files, params, headers and timeout.
+        """
+        return self.session.request(method, url, **kwargs)
+
+    def _enter_pool(self):
+        """
+        Counts a request in flight and emits pool.saturated event if there are more requests in flight than
+        the pooled connections carry, such requests either wait for a connection or open one that is discarded.
+        """
+        with self._in_flight_lock:
+            self._in_flight += 1
+            in_flight = self._in_flight
+
+        if in_flight > self.pool_maxsize * self.streams:
+            self.instrumentation.emit('pool.saturated', in_flight=in_flight, pool_maxsize=self.pool_maxsize)
+
+    def _exit_pool(self):
+        """
+        Counts a request that is finished.
+        """
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def connection_pool(self, url):
+        """
+        Returns urllib3 connection pool requests to the url are sent through, or None if the engine doesn't
+        expose its pool, so its connections can't be prewarmed.
+
+        :param string url: (required). URL of the host.
+        """
+        return None
+
+    def prewarm(self, url, connections=1):
+        """
+        Opens keep-alive connections to the host of the url concurrently and puts them in the connection pool,
+        so the first requests don't pay DNS lookups and TLS handshakes. No request is sent to FacePP. Returns
+        the number of connections opened, each failed one is emitted as a prewarm.error event.
+
+        :param string url: (required). URL of the host, i.e. FacePP location.
+        :param int connections: (optional). Number of connections, it's capped by the pool size.
+        """
+        try:
+            pool = self.connection_pool(url)
+        except Exception as e:
+            self.instrumentation.emit('prewarm.error', url=url, error=e)
+            return 0
+
+        if pool is None:
+            return 0
+
+        # Connections are taken out of the pool all at once, so each of them is a distinct connection
+        conns = []
+        for _ in range(min(connections, self.pool_maxsize)):
+            try:
+                conns.append(pool._get_conn(timeout=0))
+            except urllib3.exceptions.EmptyPoolError:
+                break
+
+        def connect(conn):
+            try:
+                conn.connect()
+                return 1
+            except Exception as e:
+                conn.close()
+                self.instrumentation.emit('prewarm.error', url=url, error=e)
+                return 0
+
+        executor = futures.ThreadPoolExecutor(max_workers=max(len(conns), 1))
+        try:
+            opened = sum(executor.map(connect, conns))
+        finally:
+            executor.shutdown(wait=False)
+            for conn in conns:
+                pool._put_conn(conn)
+
+        self.instrumentation.count('pool.prewarmed', opened)
+        return opened
+
+    @property
+    def executor(self):
+        """
+        Returns a thread pool that is used to run requests to FacePP concurrently.
+        """
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = futures.ThreadPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def map(self, fn, *iterables):
+        """
+        Calls fn concurrently for each set of arguments and returns results in the original order.
+        Calls that are made from inside the engine's thread pool run one by one to avoid deadlocks.
+
+        :param fn: (required). Callable that makes requests to FacePP.
+        :param iterables: (required). Iterables with fn arguments.
+        """
+        if self.workers <= 1 or getattr(self._local, 'pooled', False):
+            return list(map(fn, *iterables))
+
+        fn = self._bind(fn)
+
+        def pooled(*args):
+            self._local.pooled = True
+            try:
+                return fn(*args)
+            finally:
+                self._local.pooled = False
+
+        return list(self.executor.map(pooled, *iterables))
+
+    def settle(self, fn, *iterables, **kwargs):
+        """
+        Calls fn concurrently for each set of arguments and returns a list of (result, exception) pairs in the
+        original order, a failed call doesn't affect the others. A call that doesn't finish within timeout seconds
+        since it was started gets futures.TimeoutError, it isn't interrupted but its result is discarded.
+
+        :param fn: (required). Callable that makes requests to FacePP.
+        :param iterables: (required). Iterables with fn arguments.
+        :param float timeout: (optional). Max number of seconds a single call may take.
+        """
+        timeout = kwargs.pop('timeout', None)
+        arguments = list(zip(*iterables))
+
+        def call(*args):
+            try:
+                return fn(*args), None
+            except Exception as e:
+                return None, e
+
+        if self.workers <= 1 or getattr(self._local, 'pooled', False):
+            return [call(*args) for args in arguments]
+
+        started = {}
+        call = self._bind(call)
+
+        def pooled(index, args):
+            started[index] = time.time()
+            self._local.pooled = True
+            try:
+                return call(*args)
+            finally:
+                self._local.pooled = False
+
+        pending = dict((self.executor.submit(pooled, index, args), index) for index, args in enumerate(arguments))
+        settled = [(None, futures.TimeoutError()) for _ in arguments]
+
+        while pending:
+            deadlines = [started[index] + timeout for index in pending.values() if index in started] \
+                if timeout is not None else []
+            wait = max(min(deadlines) - time.time(), 0) if deadlines else timeout
+            done, _ = futures.wait(list(pending), timeout=wait, return_when=futures.FIRST_COMPLETED)
+
+            for future in done:
+                settled[pending.pop(future)] = future.result()
+
+            now = time.time()
+            for future, index in list(pending.items()) if timeout is not None else []:
+                if index in started and now >= started[index] + timeout:
+                    future.cancel()
+                    del pending[future]
+
+        return settled
+
+    def pages(self, method, url, container, **data):
+        """
+        Yields resources of each page together with the start of the next page one after another.
+        Resources that don't support start/next on FacePP level are returned as a single page.
 
         :param string method: (required). HTTP verb to use for the request.
         :param string url: (required). URL of the request.
         :param string container: (required).
         :param dict data (optional). data that should be used for resource retrieval.
         """
-        limit = data.pop('limit') or self.chunk
+        limit = data.pop('limit', None) or self.chunk
         start = data.get('start') or 1
-        next_start = None
+        size = 0
 
-        response = self.request(method, url, data=dict(data, start=start))
+        while True:
+            response = self.request(method, url, data=dict(data, start=start))
+            results = response[container]
+            results = results if isinstance(results, (list, tuple)) else [results]
+            next_start = response.get('next')
 
-        # Resource supports start/next on FacePP level
-        if all(response.get(param) is not None for param in ('next', )):
-            next_start = response['next']
-            results = response
+            yield results, next_start
 
-            container_size = next_start - start
-            while limit > container_size:
-                start = next_start
-                response = self.request(method, url, data=dict(data, start=start))
+            size += len(results)
+            if not next_start or size >= limit:
+                break
+            start = next_start
 
-                next_start = response.get('next')
-                results[container].extend(response[container])
-                results['next'] = next_start
+    def iter_pages(self, method, url, container, **data):
+        """
+        Yields resources of each page as soon as it arrives while the next page is fetched in the background.
+        Only a page ahead of the consumer is kept in memory, so memory stays bounded at any limit.
 
-                if next_start:
-                    container_size += (next_start - start)
-                else:
+        :param string method: (required). HTTP verb to use for the request.
+        :param string url: (required). URL of the request.
+        :param string container: (required).
+        :param dict data (optional). data that should be used for resource retrieval.
+        """
+        pages = queue.Queue(maxsize=1)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    return pages.put(item, timeout=0.1)
+                except queue.Full:
+                    continue
+
+        def fetch():
+            try:
+                for results, _ in self.pages(method, url, container, **data):
+                    if stop.is_set():
+                        break
+                    put(results)
+                put(None)
+            except BaseException as e:  # the consumer gets a terminal item whatever stopped the thread
+                put(e)
+                if not isinstance(e, Exception):
+                    raise
+
+        thread = threading.Thread(target=self._bind(fetch), name='facepp-pages')
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while True:
+                results = pages.get()
+                if results is None:
                     break
+                if isinstance(results, BaseException):
+                    raise results
+                yield results
+        finally:
+            stop.set()
 
-        # We have to mimic start/next if a resource
-        # doesn't support this feature on FacePP level
-        else:
-            results = response[container]
+    def bulk_request(self, method, url, container, **data):
+        """
+        Makes needed preparations before launching the active engine's request process.
 
-        return results if isinstance(results, (list, tuple)) else [results], next_start
+        :param string method: (required). HTTP verb to use for the request.
+        :param string url: (required). URL of the request.
+        :param string container: (required).
+        :param dict data (optional). data that should be used for resource retrieval.
+        """
+        results, next_start = [], None
+
+        for page, next_start in self.pages(method, url, container, **data):
+            results.extend(page)
+
+        return results, next_start
+
+    def chunked_request(self, method, url, container, key, size, **data):
+        """
+        Splits a comma separated list of ids into chunks that FacePP accepts in a single request,
+        makes these requests concurrently and merges their results preserving the order of ids.
+
+        :param string method: (required). HTTP verb to use for the request.
+        :param string url: (required). URL of the request.
+        :param string container: (required).
+        :param string key: (required). Name of the param with a list of ids, i.e. face_tokens.
+        :param int size: (required). Max number of ids in a single request.
+        :param dict data (optional). data that should be used for resource retrieval.
+        """
+        ids = data[key].split(',') if not isinstance(data[key], (list, tuple)) else list(data[key])
+        ids = [item.strip() for item in ids if item.strip()]
+
+        if len(ids) <= size:
+            return self.bulk_request(method, url, container, **data)
+
+        def request(chunk):
+            return self.bulk_request(method, url, container, **dict(data, **{key: ','.join(chunk)}))[0]
+
+        results = [result for chunk in self.map(request, [ids[i:i + size] for i in range(0, len(ids), size)])
+                   for result in chunk]
+
+        # Concurrent responses are merged in order of chunks, but we shouldn't rely on FacePP
+        # returning resources of a single chunk in the requested order
+        id_key = key[:-1]
+        order = dict((item, position) for position, item in reversed(list(enumerate(ids))))
+        results.sort(key=lambda result: order.get(result.get(id_key) if isinstance(result, dict) else None, len(ids)))
+        return results, None
 
     def process_response(self, response):
         """
@@ -164,20 +637,24 @@ class BaseEngine(object):
         status_code = response.status_code
 
         if status_code in (200, 201, 204):
-            if self.return_raw_response:
+            lazy_json = self._option('lazy_json')
+
+            if self._option('return_raw_response'):
                 return response
-            elif not response.content.strip():
+            elif not response.content or response.content.isspace():
                 return True
             else:
                 try:
-                    return response.json()
+                    if lazy_json:
+                        return jsonlib.loads_lazy(response.content, lazy_json, self.json_loads)
+                    return self.json_loads(response.content)
                 except (ValueError, TypeError):
                     raise exceptions.JSONDecodeError(response)
 
         error_reason = None
         error_details = None
         try:
-            response_failed = response.json()
+            response_failed = self.json_loads(response.content)
             error_message = response_failed['error_message']
             if not isinstance(error_message, str) and not isinstance(error_message, unicode):
                 error_message = ''
@@ -0,0 +1,83 @@
+"""
+Engine that multiplexes concurrent requests over a few HTTP/2 connections, requires optional httpx[http2].
+"""
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from . import BaseEngine
+from .. import exceptions
+
+
+class HTTP2Engine(BaseEngine):
+    """
+    Engine built on httpx client with HTTP/2 enabled, concurrent requests to FacePP share a few connections
+    as streams instead of opening a connection each. Redirects aren't followed, FacePP redirect raises
+    HTTPProtocolError, and responses are httpx responses that are processed as SyncEngine responses are.
+    httpx doesn't expose its connection pool, so connections aren't prewarmed.
+    """
+    streams = 100  # Concurrent streams most HTTP/2 servers allow per connection.
+    request_options = ('headers', 'params', 'data', 'timeout')
+    session_params = ('headers', 'params', 'data', 'proxies', 'verify', 'cert')
+
+    def __init__(self, api_key, api_secret, **options):
+        """
+        :param string api_key: (required). Your registered API Key to call API.
+        :param string api_secret: (required). Your registered API Secret to call API.
+        :param bool http1: (optional). Whether HTTP/1.1 can be negotiated, if it's False HTTP/2 is used with
+                           prior knowledge, so cleartext HTTP/2 servers, i.e. a local stand-in, can be used.
+        :param httpx.BaseTransport transport: (optional). Transport the client sends requests with, i.e.
+                                              httpx.MockTransport.
+        """
+        if httpx is None:
+            raise exceptions.OptionalDependencyError('httpx[http2]')
+
+        self.http1 = options.pop('http1', True)
+        self.transport = options.pop('transport', None)
+        super(HTTP2Engine, self).__init__(api_key, api_secret, **options)
+
+    def create_session(self, **params):
+        unknown = [name for name in params if name not in self.session_params]
+
+        if unknown:
+            raise exceptions.ValidationError('{0} isn\'t supported by HTTP2Engine'.format(', '.join(sorted(unknown))))
+
+        proxies = params.get('proxies') or {}
+        limits = httpx.Limits(max_connections=self.pool_maxsize * self.pool_connections if self.pool_block else None,
+                              max_keepalive_connections=self.pool_maxsize)
+
+        try:
+            return httpx.Client(
+                http1=self.http1, http2=True, headers=params.get('headers'), params=params.get('params'),
+                verify=params.get('verify', True), cert=params.get('cert'), limits=limits, timeout=None,
+                proxy=proxies.get('https') or proxies.get('http'), transport=self.transport)
+        except ImportError:  # h2 isn't installed
+            raise exceptions.OptionalDependencyError('httpx[http2]')
+
+    def send(self, method, url, data=None, files=None, params=None, headers=None, timeout=None):
+        if isinstance(data, dict):
+            kwargs = {'data': data, 'files': files or None}
+        else:
+            kwargs = {'content': data or None}
+
+        response = self.session.request(method.upper(), url, params=params or None, headers=headers,
+                                        timeout=self.client_timeout(timeout), **kwargs)
+
+        if response.is_redirect:
+            raise exceptions.HTTPProtocolError
+
+        return response
+
+    @staticmethod
+    def client_timeout(timeout):
+        """
+        Returns httpx timeout of the request.
+
+        :param timeout: (required). Timeout in seconds, either a float, (connect, read) tuple or None.
+        :type timeout: float, tuple or None
+        """
+        if isinstance(timeout, (list, tuple)):
+            return httpx.Timeout(timeout[1], connect=timeout[0])
+        return timeout
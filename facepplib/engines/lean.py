@@ -0,0 +1,239 @@
+"""
+Lean engine that sends requests straight through urllib3 connection pools with minimal per-request overhead.
+"""
+
+import binascii
+import os
+
+try:
+    from urllib.parse import urlencode
+except ImportError:  # Python 2
+    from urllib import urlencode
+
+import urllib3
+import urllib3.fields
+
+try:
+    import certifi
+except ImportError:
+    certifi = None
+
+from . import BaseEngine
+from .. import exceptions
+
+text_type = type(u'')
+
+# Connection errors aren't retried and redirects aren't followed, as requests does by default for the former
+retries = urllib3.Retry(0, read=False, redirect=False)
+
+
+def to_bytes(value):
+    """
+    Returns form value as utf-8 encoded bytes.
+
+    :param any value: (required). Form value.
+    """
+    if isinstance(value, bytes):
+        return value
+    return (value if isinstance(value, text_type) else str(value)).encode('utf-8')
+
+
+def form_fields(data):
+    """
+    Returns a list of (name, value) form fields, list values are sent as repeated fields.
+
+    :param dict data: (required). Form data.
+    """
+    return [(name, to_bytes(item)) for name, value in data.items()
+            for item in (value if isinstance(value, (list, tuple)) else [value])]
+
+
+def remaining_size(fp):
+    """
+    Returns number of bytes left to read from the file-like object or None if it isn't seekable.
+
+    :param fp: (required). File-like object.
+    """
+    try:
+        position = fp.tell()
+        end = fp.seek(0, os.SEEK_END)
+        end = fp.tell() if end is None else end  # file objects of Python 2 return None
+        fp.seek(position)
+    except (AttributeError, IOError, OSError, ValueError):
+        return None
+    return end - position
+
+
+class MultipartBody(object):
+    """
+    File-like multipart/form-data body with a known length. Files are streamed from their file-like objects
+    as the body is read, so uploaded images aren't copied into memory, unless they can't be sized.
+    """
+    def __init__(self, fields, files):
+        """
+        :param list fields: (required). List of (name, value) form fields with bytes values.
+        :param dict files: (required). Files by field name as tuples of file name, file-like object and mime type.
+        """
+        boundary = binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.content_type = 'multipart/form-data; boundary=' + boundary
+        self.parts = []
+
+        for name, value in fields:
+            self.parts.extend([self._headers(boundary, name), value, b'\r\n'])
+
+        for name, (filename, fp, filetype) in files.items():
+            self.parts.extend([self._headers(boundary, name, filename, filetype),
+                               fp if remaining_size(fp) is not None else to_bytes(fp.read()), b'\r\n'])
+
+        self.parts.append('--{0}--\r\n'.format(boundary).encode('ascii'))
+        self.length = sum(len(part) if isinstance(part, bytes) else remaining_size(part) for part in self.parts)
+
+    @staticmethod
+    def _headers(boundary, name, filename=None, filetype=None):
+        """
+        Returns boundary and headers of a form field.
+
+        :param string boundary: (required). Multipart boundary.
+        :param string name: (required). Field name.
+        :param string filename: (optional). File name of a file field.
+        :param string filetype: (optional). Mime type of a file field.
+        """
+        field = urllib3.fields.RequestField(name, b'', filename)
+        field.make_multipart(content_type=filetype)
+        return '--{0}\r\n'.format(boundary).encode('ascii') + to_bytes(field.render_headers())
+
+    def read(self, size=-1):
+        """
+        Reads up to size bytes of the body, all of the rest if size is negative.
+
+        :param int size: (optional). Max number of bytes to read.
+        """
+        chunks = []
+
+        while self.parts and size != 0:
+            part = self.parts[0]
+            if isinstance(part, bytes):
+                chunk = part if size < 0 else part[:size]
+                if len(chunk) == len(part):
+                    self.parts.pop(0)
+                else:
+                    self.parts[0] = part[len(chunk):]
+            else:
+                chunk = part.read() if size < 0 else part.read(size)
+                if not chunk:
+                    self.parts.pop(0)
+                    continue
+            chunks.append(chunk)
+            size -= len(chunk) if size > 0 else 0
+
+        return b''.join(chunks)
+
+    def __len__(self):
+        """
+        Allows len() to be called on a MultipartBody object, returns the body length in bytes.
+        """
+        return self.length
+
+
+class Response(object):
+    """
+    Response of LeanEngine with the attributes that are used to process FacePP responses.
+    """
+    __slots__ = ('status_code', 'content', 'headers', 'url', 'history')
+
+    def __init__(self, status_code, content, headers, url):
+        """
+        :param int status_code: (required). HTTP status code.
+        :param bytes content: (required). Response body.
+        :param dict headers: (required). Response headers.
+        :param string url: (required). URL of the request.
+        """
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.url = url
+        self.history = ()
+
+    def __repr__(self):
+        """
+        Official representation of a Response object.
+        """
+        return '<facepplib.engines.lean.Response [{0}]>'.format(self.status_code)
+
+
+class LeanEngine(BaseEngine):
+    """
+    Engine built on urllib3 pool manager without requests. Request body is encoded once straight from the
+    request data and uploaded files are streamed into it, cookies aren't kept and redirects aren't followed,
+    FacePP redirect raises HTTPProtocolError. Responses are Response objects with raw bytes content.
+    Connection options it doesn't support, i.e. cookies or auth, raise ValidationError.
+    """
+    request_options = ('headers', 'params', 'data', 'timeout')
+    session_params = ('headers', 'params', 'data', 'proxies', 'verify', 'cert')
+
+    def create_session(self, **params):
+        unknown = [name for name in params if name not in self.session_params]
+
+        if unknown:
+            raise exceptions.ValidationError('{0} isn\'t supported by LeanEngine'.format(', '.join(sorted(unknown))))
+
+        kwargs = dict(num_pools=self.pool_connections, maxsize=self.pool_maxsize, block=self.pool_block)
+        verify = params.get('verify', True)
+
+        if verify is False:
+            kwargs['cert_reqs'] = 'CERT_NONE'
+        else:
+            kwargs['cert_reqs'] = 'CERT_REQUIRED'
+            if verify is not True:
+                kwargs['ca_certs'] = verify
+            elif certifi is not None:
+                kwargs['ca_certs'] = certifi.where()
+
+        cert = params.get('cert')
+        if cert:
+            kwargs['cert_file'], kwargs['key_file'] = cert if isinstance(cert, (list, tuple)) else (cert, None)
+
+        proxies = params.get('proxies') or {}
+        proxy = proxies.get('https') or proxies.get('http')
+        return urllib3.ProxyManager(proxy, **kwargs) if proxy else urllib3.PoolManager(**kwargs)
+
+    def send(self, method, url, data=None, files=None, params=None, headers=None, timeout=None):
+        params = dict(self.requests['params'], **params) if params else self.requests['params']
+        if params:
+            url += ('&' if '?' in url else '?') + urlencode(form_fields(params))
+
+        headers = dict(self.requests['headers'], **headers) if headers else dict(self.requests['headers'])
+
+        if files:
+            body = MultipartBody(form_fields(data or {}), files)
+            headers['Content-Type'], headers['Content-Length'] = body.content_type, str(body.length)
+        elif isinstance(data, dict):
+            body = urlencode(form_fields(data)) or None
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        else:
+            body = data or None
+
+        response = self.session.urlopen(method.upper(), url, body=body, headers=headers, redirect=False,
+                                        retries=retries, timeout=self.pool_timeout(timeout))
+
+        if 300 <= response.status < 400:
+            raise exceptions.HTTPProtocolError
+
+        return Response(response.status, response.data, response.headers, url)
+
+    @staticmethod
+    def pool_timeout(timeout):
+        """
+        Returns urllib3 timeout of the request.
+
+        :param timeout: (required). Timeout in seconds, either a float, (connect, read) tuple or None.
+        :type timeout: float, tuple or None
+        """
+        if timeout is None:
+            return urllib3.Timeout.DEFAULT_TIMEOUT
+        if isinstance(timeout, (list, tuple)):
+            return urllib3.Timeout(connect=timeout[0], read=timeout[1])
+        return timeout
+
+    def connection_pool(self, url):
+        return self.session.connection_from_url(url)
@@ -3,16 +3,31 @@ Synchronous blocking engine that processes requests one by one.
 """
 
 import requests
+import requests.adapters
 
 from . import BaseEngine
 
 
 class SyncEngine(BaseEngine):
-    @staticmethod
-    def create_session(**params):
+    def create_session(self, **params):
         session = requests.Session()
 
+        # Connections are kept alive and their TLS sessions are reused as long as the pool has room for them
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, pool_block=self.pool_block)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
         for param in params:
             setattr(session, param, params[param])
 
         return session
+
+    def connection_pool(self, url):
+        adapter = self.session.get_adapter(url)
+
+        # get_connection() is deprecated since requests 2.32 in favour of the TLS context aware method
+        if hasattr(adapter, 'get_connection_with_tls_context'):
+            return adapter.get_connection_with_tls_context(
+                requests.Request('HEAD', url).prepare(), self.session.verify, self.session.proxies, self.session.cert)
+        return adapter.get_connection(url, self.session.proxies)
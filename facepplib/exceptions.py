@@ -568,4 +568,9 @@ class ExportFormatNotSupportedError(BaseFacePPError):
             "The given format isn't supported by resource")
 
 
-
+class OptionalDependencyError(BaseFacePPError):
+    """
+    Feature requires an optional dependency that isn't installed.
+    """
+    def __init__(self, dependency):
+        super(OptionalDependencyError, self).__init__('{0} should be installed to use this feature'.format(dependency))
@@ -0,0 +1,223 @@
+"""
+Provides client-side fetching of image_url inputs that are uploaded to FacePP as image_file instead.
+"""
+
+import io
+import mimetypes
+import posixpath
+import threading
+import time
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:  # Python 2
+    from urlparse import urlsplit
+
+import urllib3
+
+from . import exceptions, utilities
+
+# image_url inputs and image_file inputs they are replaced with
+inputs = {'image_url': 'image_file', 'image_url1': 'image_file1', 'image_url2': 'image_file2'}
+
+
+def host(url):
+    """
+    Returns host of the image url.
+
+    :param string url: (required). Image url.
+    """
+    return urlsplit(url).netloc.lower()
+
+
+class ImageFetcher(object):
+    """
+    Downloads images of image_url inputs with pooled concurrent connections and a local bytes cache, so slow
+    image hosts don't make FacePP fail with IMAGE_DOWNLOAD_TIMEOUT. Depending on the mode images are fetched
+    never, after FacePP failed to download them, always, or automatically for hosts that were measured slow.
+    """
+    modes = ('never', 'on_timeout', 'always', 'auto')
+
+    def __init__(self, mode='on_timeout', cache=100, max_size=2 * 1024 * 1024, timeout=10, slow=2, recheck=600,
+                 pool_maxsize=10, slow_timeout=30):
+        """
+        :param string mode: (optional). When images are fetched: never, on_timeout, always or auto.
+        :param int cache: (optional). Max number of fetched images cached by URL, 0 disables caching.
+        :param int max_size: (optional). Max image size in bytes, larger images are left for FacePP to download.
+        :param float timeout: (optional). Max number of seconds a single download may take.
+        :param float slow_timeout: (optional). Max number of seconds a download from a slow host may take.
+        :param float slow: (optional). Download seconds a host is considered slow for FacePP after in auto mode.
+        :param int recheck: (optional). Seconds after which a slow host is tried by FacePP again in auto mode.
+        :param int pool_maxsize: (optional). Max number of keep-alive connections kept per image host.
+        """
+        if mode not in self.modes:
+            raise exceptions.ValidationError('mode should be one of {0}'.format(', '.join(self.modes)))
+
+        self.mode = mode
+        self.max_size = max_size
+        self.timeout = timeout
+        self.slow_timeout = slow_timeout
+        self.slow = slow
+        self.recheck = recheck
+        self.cache = utilities.LRUCache(cache)
+        self.slow_hosts = {}  # host: time it was found slow
+        self.lock = threading.Lock()
+        # A failed connect or read is retried once and up to 3 redirects are followed, total only has to fit them
+        self.pool = urllib3.PoolManager(maxsize=pool_maxsize, retries=urllib3.Retry(
+            total=5, connect=1, read=1, redirect=3))
+
+    @classmethod
+    def from_option(cls, option):
+        """
+        Returns ImageFetcher object or None from the image_fetch engine option.
+
+        :param option: (required). Mode name, ImageFetcher options, ImageFetcher object or None.
+        :type option: string, dict, ImageFetcher or None
+        """
+        if option is None or isinstance(option, cls):
+            return option
+        if isinstance(option, dict):
+            return cls(**option)
+        return cls(option) if option != 'never' else None
+
+    def is_slow(self, url):
+        """
+        Checks whether FacePP is expected to fail to download the image in time.
+
+        :param string url: (required). Image url.
+        """
+        with self.lock:
+            found_at = self.slow_hosts.get(host(url))
+        return found_at is not None and time.time() - found_at < self.recheck
+
+    def mark_slow(self, url):
+        """
+        Remembers host of the image as slow for FacePP.
+
+        :param string url: (required). Image url.
+        """
+        with self.lock:
+            self.slow_hosts[host(url)] = time.time()
+
+    @staticmethod
+    def _failed(url, instrumentation, reason, started, **data):
+        """
+        Emits an image.fetch.error event and returns None.
+
+        :param string url: (required). Image url.
+        :param instrumentation.Instrumentation instrumentation: (required). Instrumentation or None.
+        :param string reason: (required). Why the image wasn't fetched: status, error or too_large.
+        :param float started: (required). Time the download started at.
+        :param dict data: (optional). Event data, i.e. status or error.
+        """
+        if instrumentation is not None:
+            instrumentation.emit('image.fetch.error', url=url, reason=reason, elapsed=time.time() - started, **data)
+
+    def fetch(self, url, instrumentation=None):
+        """
+        Returns an image_file value with the image bytes: a tuple of file name, file-like object and mime type,
+        or None if the image couldn't be fetched or it's too large to be uploaded. Images of hosts that are slow
+        for FacePP are downloaded with slow_timeout.
+
+        :param string url: (required). Image url.
+        :param instrumentation.Instrumentation instrumentation: (optional). Instrumentation that gets fetch events.
+        """
+        image = self.cache.get(url)
+        cached = image is not None
+        started = time.time()
+
+        if not cached:
+            timeout = self.slow_timeout if self.is_slow(url) else self.timeout
+            try:
+                response = self.pool.request('GET', url, timeout=timeout, preload_content=False)
+                try:
+                    if response.status != 200:
+                        return self._failed(url, instrumentation, 'status', started, status=response.status)
+                    content = response.read(self.max_size + 1)
+                finally:
+                    response.release_conn()
+            except urllib3.exceptions.HTTPError as e:
+                return self._failed(url, instrumentation, 'error', started, error=e)
+
+            if len(content) > self.max_size:
+                return self._failed(url, instrumentation, 'too_large', started, max_size=self.max_size)
+
+            name = posixpath.basename(urlsplit(url).path) or 'image'
+            mime = (response.headers.get('Content-Type') or '').split(';')[0].strip() or \
+                mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            image = (name, content, mime)
+            self.cache.set(url, image)
+
+            if self.mode == 'auto' and time.time() - started >= self.slow:
+                self.mark_slow(url)
+
+        if instrumentation is not None:
+            instrumentation.emit('image.fetched', url=url, size=len(image[1]), elapsed=time.time() - started,
+                                 cached=cached)
+
+        # Each upload gets its own file-like object, bytes are streamed from it into the multipart body
+        return image[0], io.BytesIO(image[1]), image[2]
+
+    def _fetch_all(self, engine, urls):
+        """
+        Fetches images concurrently and returns fetched images by image_url input name, failed ones are skipped.
+
+        :param engines.BaseEngine engine: (required). Engine that runs downloads concurrently.
+        :param dict urls: (required). Image urls by input name.
+        """
+        names = list(urls)
+        images = engine.map(lambda name: self.fetch(urls[name], engine.instrumentation), names)
+        return dict((name, image) for name, image in zip(names, images) if image is not None)
+
+    @staticmethod
+    def _replace(data, images):
+        """
+        Returns a copy of request data with image_url inputs replaced by fetched image_file inputs.
+
+        :param dict data: (required). Request data.
+        :param dict images: (required). Fetched images by image_url input name.
+        """
+        data = dict(data)
+        for name, image in images.items():
+            del data[name]
+            data[inputs[name]] = image
+        return data
+
+    def request(self, engine, method, url, headers, params, data):
+        """
+        Makes a request to FacePP with engine, image_url inputs are fetched and uploaded according to the mode.
+
+        :param engines.BaseEngine engine: (required). Engine the request is made with.
+        :param string method: (required). HTTP verb to use for the request.
+        :param string url: (required). URL of the request.
+        :param dict headers: (required). HTTP headers to send with the request.
+        :param dict params: (required). Params to send in the query string.
+        :param dict data: (required). Request data with api key and secret.
+        """
+        urls = dict((name, data[name]) for name in inputs if data.get(name))
+
+        if not urls or self.mode == 'never':
+            return engine._request(method, url, headers, params, data)
+
+        if self.mode == 'always' or (self.mode == 'auto' and any(self.is_slow(image) for image in urls.values())):
+            images = self._fetch_all(engine, urls)
+            return engine._request(method, url, headers, params, self._replace(data, images))
+
+        try:
+            return engine._request(method, url, headers, params, data)
+        except exceptions.ImageDownloadTimeout:
+            for image in urls.values():
+                self.mark_slow(image)
+
+            images = self._fetch_all(engine, urls)
+            if not images:
+                raise
+
+            engine.instrumentation.emit('image.fallback', url=url, images=list(urls.values()))
+            return engine._request(method, url, headers, params, self._replace(data, images))
+
+    def __repr__(self):
+        """
+        Official representation of an ImageFetcher object.
+        """
+        return '<facepplib.fetch.ImageFetcher object {0} mode>'.format(self.mode)
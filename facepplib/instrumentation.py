@@ -0,0 +1,97 @@
+"""
+Provides counters and events that report what engines do, i.e. requests made and connection pool saturation.
+"""
+
+import collections
+import threading
+
+
+class Instrumentation(object):
+    """
+    Thread-safe counters of named events and subscribers that are called when events are emitted.
+    """
+    def __init__(self, parent=None):
+        """
+        :param Instrumentation parent: (optional). Instrumentation that gets all counts and events as well,
+                                       i.e. the one of the engine when this one is layered in a session.
+        """
+        self.parent = parent
+        self.counters = collections.Counter()
+        self.subscribers = {}  # event name or *: list of callbacks
+        self.lock = threading.Lock()
+
+    def subscribe(self, event, callback):
+        """
+        Calls callback with event name and event data each time the event is emitted.
+
+        :param string event: (required). Event name, i.e. request, or * to subscribe to all events.
+        :param callback: (required). Callable that accepts event name and event data dict.
+        """
+        with self.lock:
+            self.subscribers.setdefault(event, []).append(callback)
+
+    def unsubscribe(self, event, callback):
+        """
+        Stops calling callback when the event is emitted.
+
+        :param string event: (required). Event name or *.
+        :param callback: (required). Callable that was subscribed.
+        """
+        with self.lock:
+            callbacks = self.subscribers.get(event, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def count(self, name, value=1):
+        """
+        Increments the counter without emitting an event.
+
+        :param string name: (required). Counter name.
+        :param value: (optional). Increment.
+        :type value: int or float
+        """
+        with self.lock:
+            self.counters[name] += value
+
+        if self.parent is not None:
+            self.parent.count(name, value)
+
+    def emit(self, event, **data):
+        """
+        Counts the event and calls its subscribers, exceptions raised by subscribers aren't propagated.
+
+        :param string event: (required). Event name.
+        :param dict data: (optional). Event data.
+        """
+        with self.lock:
+            self.counters[event] += 1
+            callbacks = self.subscribers.get(event, []) + self.subscribers.get('*', [])
+
+        for callback in callbacks:
+            try:
+                callback(event, data)
+            except Exception:
+                pass
+
+        if self.parent is not None:
+            self.parent.emit(event, **data)
+
+    def snapshot(self):
+        """
+        Returns a dict with current values of all counters.
+        """
+        with self.lock:
+            return dict(self.counters)
+
+    def reset(self):
+        """
+        Sets all counters to zero, subscribers are kept.
+        """
+        with self.lock:
+            self.counters.clear()
+
+    def __repr__(self):
+        """
+        Official representation of an Instrumentation object.
+        """
+        return '<facepplib.instrumentation.Instrumentation object with {0} counters>'.format(len(self.counters))
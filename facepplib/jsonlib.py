@@ -0,0 +1,210 @@
+"""
+Provides pluggable JSON decoding and lazy decoding of heavy JSON subtrees.
+"""
+
+import json
+import re
+import sys
+
+from . import exceptions
+
+
+def stdlib_loads(content):
+    """
+    Decodes JSON with the standard library, json module accepts bytes only since Python 3.6.
+
+    :param bytes content: (required). JSON content.
+    """
+    if isinstance(content, bytes) and (3, 0) <= sys.version_info[:2] < (3, 6):
+        content = content.decode('utf-8')
+    return json.loads(content)
+
+
+def get_loads(backend=None):
+    """
+    Returns a function that decodes JSON from bytes with the requested backend. If backend isn't provided
+    the fastest installed one is used, in order of preference: orjson, ujson and json from the standard library.
+
+    :param backend: (optional). Backend name or a callable that decodes JSON from bytes.
+    :type backend: string or callable
+    """
+    if callable(backend):
+        return backend
+
+    for name in ([backend] if backend else ['orjson', 'ujson', 'json']):
+        if name == 'json':
+            return stdlib_loads
+        try:
+            return __import__(name).loads
+        except ImportError:
+            if backend:
+                raise exceptions.OptionalDependencyError(name)
+
+
+class LazyJSON(object):
+    """
+    Holds raw JSON of a subtree that is decoded on first access.
+    """
+    __slots__ = ('raw', 'loads')
+
+    # Whether a subtree was ever left lazy, until then unwrap() has nothing to look for
+    created = False
+
+    def __init__(self, raw, loads):
+        """
+        :param bytes raw: (required). Raw JSON of the subtree.
+        :param loads: (required). Function that decodes JSON from bytes.
+        """
+        self.raw = raw
+        self.loads = loads
+
+    def decode(self):
+        """
+        Decodes the subtree.
+        """
+        return self.loads(self.raw)
+
+    def __repr__(self):
+        """
+        Official representation of a LazyJSON object.
+        """
+        return '<facepplib.jsonlib.LazyJSON object of {0} bytes>'.format(len(self.raw))
+
+
+def resolve(value):
+    """
+    Returns decoded value if it's a LazyJSON object or the value itself.
+
+    :param any value: (required). Value from the decoded JSON.
+    """
+    return value.decode() if isinstance(value, LazyJSON) else value
+
+
+def unwrap(value):
+    """
+    Returns the value with all LazyJSON objects in it decoded. Containers holding them are copied, so the value
+    itself stays lazy, and the value is returned as is while no subtree was left lazy.
+
+    :param any value: (required). Value from the decoded JSON.
+    """
+    if not LazyJSON.created:
+        return value
+    if isinstance(value, LazyJSON):
+        return value.decode()
+
+    if isinstance(value, dict):
+        items = [(key, unwrap(item)) for key, item in value.items()]
+        changed = any(item is not value[key] for key, item in items)
+        return dict(items) if changed else value
+    elif isinstance(value, list):
+        items = [unwrap(item) for item in value]
+        changed = any(item is not old for item, old in zip(items, value))
+        return items if changed else value
+
+    return value
+
+
+# Backends that decode a whole document faster than loads_lazy() locates subtrees in it
+eager_backends = ('orjson',)
+
+# Matches a JSON string with escapes, and a JSON token that matters when an object is skipped: a string or a brace
+string_pattern = br'"[^"\\]*(?:\\.[^"\\]*)*"'
+string_regex = re.compile(string_pattern)
+token_regex = re.compile(string_pattern + br'|[{}]')
+# Matches a colon followed by an object, i.e. what follows a key which value is an object
+object_value_regex = re.compile(br'\s*:\s*(?=\{)')
+
+# Matches a JSON object with up to 6 levels of nested objects, i.e. 1000 points landmark, strings are matched
+# as whole tokens. Nested objects are "unrolled", so a partial body fails without backtracking
+object_pattern = br'\{[^{}"]*(?:' + string_pattern + br'[^{}"]*)*\}'
+for _ in range(5):
+    object_pattern = br'\{[^{}"]*(?:(?:' + string_pattern + br'|' + object_pattern + br')[^{}"]*)*\}'
+object_regex = re.compile(object_pattern)
+
+keys_quoted = {}
+
+
+def object_end(content, start):
+    """
+    Returns offset right after the JSON object that starts at the given offset, or None if it isn't complete.
+    Strings are skipped as whole tokens, so braces in them don't count. Objects that are nested deeper than
+    the regular expression handles are scanned token by token.
+
+    :param bytes content: (required). JSON content.
+    :param int start: (required). Offset of the opening brace of the object.
+    """
+    match = object_regex.match(content, start)
+    if match is not None:
+        return match.end()
+
+    depth = 0
+
+    for token in token_regex.finditer(content, start):
+        brace = content[token.start():token.end()]
+        if brace == b'{':
+            depth += 1
+        elif brace == b'}':
+            depth -= 1
+            if not depth:
+                return token.end()
+
+    return None
+
+
+def loads_lazy(content, keys, loads):
+    """
+    Decodes JSON but leaves object values of the given keys as LazyJSON objects holding their raw JSON.
+    Subtrees are located by a scan that skips strings and counts braces, which is cheaper than building
+    Python objects for them with the standard library, values that aren't objects are decoded as usual.
+    Backends of eager_backends decode the document eagerly, the scan alone takes longer than they do.
+
+    :param bytes content: (required). JSON content.
+    :param keys: (required). Keys which values should be decoded lazily, i.e. ['landmark'].
+    :type keys: list or tuple
+    :param loads: (required). Function that decodes JSON from bytes.
+    """
+    if getattr(loads, '__module__', None) in eager_backends:
+        return loads(content)
+
+    keys = tuple(keys)
+    quoted = keys_quoted.get(keys)
+    if quoted is None:
+        quoted = keys_quoted.setdefault(keys, frozenset(json.dumps(key).encode('utf-8') for key in keys))
+
+    parts, subtrees = [], []
+    position = 0
+    string = string_regex.search(content)
+
+    # Each string of the document is visited in order, so a key is never matched inside another string
+    while string is not None:
+        end = string.end()
+        value = object_value_regex.match(content, end) if string.group() in quoted else None
+        subtree_end = object_end(content, value.end()) if value is not None else None
+
+        if subtree_end is not None:
+            # Subtree is replaced with a string holding its index after a NUL character,
+            # which is swapped with LazyJSON after decoding
+            parts.extend([content[position:value.end()], '"\\u0000{0}"'.format(len(subtrees)).encode('ascii')])
+            subtrees.append(LazyJSON(content[value.end():subtree_end], loads))
+            position = end = subtree_end
+
+        string = string_regex.search(content, end)
+
+    if not subtrees:
+        return loads(content)
+
+    LazyJSON.created = True
+    parts.append(content[position:])
+    decoded = loads(b''.join(parts))
+    stack = [decoded]
+
+    while stack:
+        value = stack.pop()
+        items = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else ()
+        for key, item in items:
+            if key in keys and isinstance(item, type(u'')) and item[:1] == u'\x00':
+                value[key] = subtrees[int(item[1:])]
+            elif isinstance(item, (dict, list)):
+                stack.append(item)
+
+    return decoded
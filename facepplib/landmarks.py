@@ -0,0 +1,289 @@
+"""
+Provides decoding of landmark payloads to NumPy arrays and vectorized helpers that operate
+on a batch of faces at once. NumPy is an optional dependency.
+"""
+
+import re
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from . import exceptions, jsonlib
+
+# Points that are used as eye centers, in order of preference
+eye_centers_table = {
+    'left': ('left_eye_center', 'left_eye_pupil_center', 'left_eye_pupil'),
+    'right': ('right_eye_center', 'right_eye_pupil_center', 'right_eye_pupil')
+}
+
+
+def natural_key(name):
+    """
+    Sort key that orders numbered point names naturally, i.e. contour_left2 before contour_left10.
+
+    :param string name: (required). Point name.
+    """
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+def turn(origin, a, b):
+    """
+    Returns cross product of vectors from origin to a and b, it's positive when a to b turns counterclockwise.
+
+    :param tuple origin: (required). Point as x, y.
+    :param tuple a: (required). Point as x, y.
+    :param tuple b: (required). Point as x, y.
+    """
+    return (a[0] - origin[0]) * (b[1] - origin[1]) - (a[1] - origin[1]) * (b[0] - origin[0])
+
+
+def layout(payload):
+    """
+    Returns a stable ordering of the landmark points as a tuple of (group, name) pairs. Payloads of
+    83 and 106 points are flat mappings of point names, dense 1000 point payloads are grouped by face
+    components, group is None for flat payloads.
+
+    :param dict payload: (required). Landmark as it was received from FacePP.
+    """
+    points = []
+
+    for key in sorted(payload, key=natural_key):
+        value = payload[key]
+        if 'x' in value and 'y' in value:
+            points.append((None, key))
+        else:
+            points.extend((key, name) for name in sorted(value, key=natural_key))
+
+    return tuple(points)
+
+
+def decode(payload, points_layout):
+    """
+    Returns a list of [x, y] coordinates of the landmark points in the order of points layout.
+
+    :param dict payload: (required). Landmark as it was received from FacePP.
+    :param tuple points_layout: (required). Points layout returned by layout().
+    """
+    try:
+        return [[point['x'], point['y']] for point in (
+            payload[name] if group is None else payload[group][name] for group, name in points_layout)]
+    except KeyError:
+        raise exceptions.ValidationError('all faces should have the same landmark points')
+
+
+class Landmarks(object):
+    """
+    Landmark of a single face as a float32 (n_points, 2) array with a name index.
+    """
+    def __init__(self, points, points_layout):
+        """
+        :param points: (required). Float32 array of (n_points, 2) shape.
+        :param tuple points_layout: (required). Points layout returned by layout().
+        """
+        self.points = points
+        self.layout = points_layout
+        self.names = tuple(name for group, name in points_layout)
+        self.index = dict((name, position) for position, name in enumerate(self.names))
+
+    @classmethod
+    def from_payload(cls, payload):
+        """
+        Decodes landmark as it was received from FacePP.
+
+        :param dict payload: (required). Landmark payload.
+        """
+        if numpy is None:
+            raise exceptions.OptionalDependencyError('numpy')
+
+        payload = jsonlib.resolve(payload)
+        points_layout = layout(payload)
+        return cls(numpy.array(decode(payload, points_layout), dtype=numpy.float32).reshape(-1, 2), points_layout)
+
+    def __getitem__(self, name):
+        """
+        Returns (x, y) coordinates of the point by name.
+        """
+        return self.points[self.index[name]]
+
+    def __len__(self):
+        """
+        Allows len() to be called on a Landmarks object.
+        """
+        return len(self.names)
+
+    def __repr__(self):
+        """
+        Official representation of a Landmarks object.
+        """
+        return '<facepplib.landmarks.Landmarks object with {0} points>'.format(len(self))
+
+
+class LandmarkBatch(Landmarks):
+    """
+    Landmarks of a batch of faces as a float32 (n_faces, n_points, 2) array sharing a single name index.
+    """
+    def __init__(self, points, points_layout, face_tokens=None):
+        """
+        :param points: (required). Float32 array of (n_faces, n_points, 2) shape.
+        :param tuple points_layout: (required). Points layout returned by layout().
+        :param list face_tokens: (optional). Face tokens in the order of faces.
+        """
+        super(LandmarkBatch, self).__init__(points, points_layout)
+        self.face_tokens = face_tokens or []
+
+    @classmethod
+    def from_resources(cls, resources, id_key='face_token'):
+        """
+        Decodes landmark of all resources, points are ordered by the layout of the first resource.
+
+        :param list resources: (required). Resources data as it was received from FacePP.
+        :param string id_key: (optional). Resource id key.
+        """
+        if numpy is None:
+            raise exceptions.OptionalDependencyError('numpy')
+
+        resources = [resource for resource in resources if resource.get('landmark')]
+        if not resources:
+            return cls(numpy.zeros((0, 0, 2), dtype=numpy.float32), ())
+
+        payloads = [jsonlib.resolve(resource['landmark']) for resource in resources]
+        points_layout = layout(payloads[0])
+        points = numpy.array([decode(payload, points_layout) for payload in payloads],
+                             dtype=numpy.float32).reshape(len(resources), len(points_layout), 2)
+        return cls(points, points_layout, [resource.get(id_key) for resource in resources])
+
+    def __getitem__(self, name):
+        """
+        Returns (n_faces, 2) coordinates of the point by name.
+        """
+        return self.points[:, self.index[name]]
+
+    def __len__(self):
+        """
+        Allows len() to be called on a LandmarkBatch object, returns the number of faces.
+        """
+        return len(self.points)
+
+    def __repr__(self):
+        """
+        Official representation of a LandmarkBatch object.
+        """
+        return '<facepplib.landmarks.LandmarkBatch object with {0} faces of {1} points>'.format(
+            len(self), len(self.names))
+
+    def group(self, name):
+        """
+        Returns (n_faces, n_group_points, 2) coordinates of the points of a face component, i.e. left_eye.
+        Points of flat payloads are matched by the name prefix.
+
+        :param string name: (required). Face component name.
+        """
+        mask = [group == name if group is not None else point.startswith(name + '_')
+                for group, point in self.layout]
+        return self.points[:, numpy.array(mask, dtype=bool)]
+
+    def eye_centers(self):
+        """
+        Returns (n_faces, 2, 2) coordinates of left and right eye centers. If the landmark doesn't
+        have a center point, the center is the mean of all eye points.
+        """
+        centers = []
+
+        for side in ('left', 'right'):
+            for name in eye_centers_table[side]:
+                if name in self.index:
+                    centers.append(self[name])
+                    break
+            else:
+                centers.append(self.group(side + '_eye').mean(axis=1))
+
+        return numpy.stack(centers, axis=1)
+
+    def inter_ocular_distances(self):
+        """
+        Returns (n_faces,) distances between eye centers.
+        """
+        centers = self.eye_centers()
+        return numpy.linalg.norm(centers[:, 0] - centers[:, 1], axis=1).astype(numpy.float32)
+
+    def bounding_boxes(self):
+        """
+        Returns (n_faces, 4) bounding boxes of the points as left, top, right, bottom.
+        """
+        return numpy.concatenate([self.points.min(axis=1), self.points.max(axis=1)], axis=1)
+
+    def convex_hulls(self):
+        """
+        Returns a list with (n_hull_points, 2) convex hull of the points of each face in counterclockwise order.
+        Points inside the octagon of the extreme points in eight directions can't be on the hull and are
+        discarded for all faces at once, the monotone chain then runs per face over the remaining points.
+        """
+        points = self.points.astype(numpy.float64)
+        directions = numpy.array([[1, 0], [1, 1], [0, 1], [-1, 1], [-1, 0], [-1, -1], [0, -1], [1, -1]],
+                                 dtype=numpy.float64)
+
+        # Extreme points are octagon vertices in counterclockwise order, a point is inside when it's strictly
+        # left of every edge, edges of coinciding vertices don't count
+        faces = numpy.arange(len(points))[:, None]
+        vertices = points[faces, numpy.einsum('npi,di->ndp', points, directions).argmax(axis=2)]
+        edges = numpy.roll(vertices, -1, axis=1) - vertices
+        offsets = points[:, None] - vertices[:, :, None]
+        crosses = edges[:, :, None, 0] * offsets[..., 1] - edges[:, :, None, 1] * offsets[..., 0]
+        degenerate = ~edges.any(axis=2)
+        inside = ((crosses > 0) | degenerate[:, :, None]).all(axis=1) & ~degenerate.all(axis=1)[:, None]
+
+        hulls = []
+
+        for face, discarded in zip(points, inside):
+            candidates = sorted(map(tuple, face[~discarded].tolist()))
+            chains = []
+            for ordered in (candidates, candidates[::-1]):
+                chain = []
+                for point in ordered:
+                    while len(chain) >= 2 and turn(chain[-2], chain[-1], point) <= 0:
+                        chain.pop()
+                    chain.append(point)
+                chains.append(chain[:-1])
+            hulls.append(numpy.array(chains[0] + chains[1], dtype=numpy.float32).reshape(-1, 2))
+
+        return hulls
+
+    def alignment_transforms(self, template=None):
+        """
+        Returns (n_faces, 2, 3) similarity transforms that align the points of each face to the template
+        in the least squares sense (Umeyama method), all faces are solved at once.
+
+        :param template: (optional). Array of (n_points, 2) shape, defaults to the mean shape of the batch.
+        """
+        template = self.points.mean(axis=0) if template is None else numpy.asarray(template, dtype=numpy.float64)
+        source = self.points.astype(numpy.float64)
+
+        source_mean = source.mean(axis=1)
+        template_mean = template.mean(axis=0)
+        source_centered = source - source_mean[:, None]
+        template_centered = template - template_mean
+
+        covariance = numpy.einsum('pi,npj->nij', template_centered, source_centered) / source.shape[1]
+        u, s, vt = numpy.linalg.svd(covariance)
+        d = numpy.sign(numpy.linalg.det(u) * numpy.linalg.det(vt))
+        d[d == 0] = 1
+        u[:, :, 1] *= d[:, None]
+
+        rotation = numpy.einsum('nij,njk->nik', u, vt)
+        variance = (source_centered ** 2).sum(axis=(1, 2)) / source.shape[1]
+        scale = (s[:, 0] + d * s[:, 1]) / numpy.where(variance > 0, variance, 1)
+        translation = template_mean - scale[:, None] * numpy.einsum('nij,nj->ni', rotation, source_mean)
+
+        return numpy.concatenate([scale[:, None, None] * rotation, translation[:, :, None]], axis=2).astype(
+            numpy.float32)
+
+    def aligned(self, template=None):
+        """
+        Returns (n_faces, n_points, 2) points of each face aligned to the template.
+
+        :param template: (optional). Array of (n_points, 2) shape, defaults to the mean shape of the batch.
+        """
+        transforms = self.alignment_transforms(template)
+        return numpy.einsum('nij,npj->npi', transforms[:, :, :2], self.points) + transforms[:, None, :, 2]
@@ -2,5 +2,5 @@
 Defines manager classes.
 """
 
-from .base import ResourceManager
-
+from .base import Query, ResourceManager
+from .facial import CompareManager, FaceManager, FaceSetManager, SearchManager
@@ -2,8 +2,14 @@
 Defines base FacePP resource manager class and it's infrastructure.
 """
 
+import collections
+
 from .. import exceptions, resultsets, utilities
 
+# Immutable state of a single call: request URL, request params and response container.
+# Queries are carried by ResourceSets, so managers hold no per-call state and can be shared by threads
+Query = collections.namedtuple('Query', ['url', 'params', 'container'])
+
 
 class ResourceManager(object):
     """
@@ -14,9 +20,6 @@ class ResourceManager(object):
         :param facepp.FacePP facepp: (required). FacePP object.
         :param resources.BaseResource resource_class: (required). Resource class.
         """
-        self.url = ''
-        self.params = {}
-        self.container = None
         self.facepp = facepp
         self.resource_class = resource_class
 
@@ -43,16 +46,13 @@ class ResourceManager(object):
         """
         return self.to_resource({})
 
-    def new_manager(self, resource_name, **params):
+    def new_manager(self, resource_name):
         """
-        Returns new ResourceManager object.
+        Returns ResourceManager object of another resource.
 
         :param string resource_name: (required). Resource name.
-        :param dict params: (optional). Parameters used for resources retrieval.
         """
-        manager = getattr(self.facepp, resource_name)
-        manager.params = params
-        return manager
+        return getattr(self.facepp, resource_name)
 
     def get(self, **params):
         """
@@ -72,17 +72,16 @@ class ResourceManager(object):
             return resource
 
         try:
-            self.url = self.facepp.url + self.resource_class.query_one.format(**params)
+            url = self.facepp.url + self.resource_class.query_one.format(**params)
         except KeyError as exception:
             raise exceptions.ValidationError('{0} argument is required'.format(exception))
 
-        self.params = self.resource_class.bulk_decode(params, self)
-        self.container = self.resource_class.container_one
+        container = self.resource_class.container_one
 
         try:
-            res = self.facepp.engine.request('post', self.url, data=self.params)
-            if self.container is not None:
-                res = res[self.container]
+            res = self.facepp.engine.request('post', url, data=self.resource_class.bulk_decode(params, self))
+            if container is not None:
+                res = res[container]
             return self.to_resource(dict(res, **params))
         except exceptions.ResourceNotFoundError as e:
             if self.resource_class.requirements:
@@ -98,10 +97,9 @@ class ResourceManager(object):
         if self.resource_class.query_all is None or self.resource_class.container_all is None:
             raise exceptions.ResourceBadMethodError
 
-        self.url = self.facepp.url + self.resource_class.query_all.format(**params)
-        self.params = self.resource_class.bulk_decode(params, self)
-        self.container = self.resource_class.container_all
-        return resultsets.ResourceSet(self)
+        query = Query(self.facepp.url + self.resource_class.query_all.format(**params),
+                      self.resource_class.bulk_decode(params, self), self.resource_class.container_all)
+        return resultsets.ResourceSet(self, query=query)
 
     def filter(self, **filters):
         """
@@ -116,13 +114,12 @@ class ResourceManager(object):
             raise exceptions.ResourceNoFiltersProvidedError
 
         try:
-            path, self.container = self.resource_class.construct_query_filter_path_and_container(self, **filters)
-            self.url = self.facepp.url + path
+            path, container = self.resource_class.construct_query_filter_path_and_container(self, **filters)
         except KeyError:
             raise exceptions.ResourceFilterError
 
-        self.params = self.resource_class.bulk_decode(filters, self)
-        return resultsets.ResourceSet(self)
+        query = Query(self.facepp.url + path, self.resource_class.bulk_decode(filters, self), container)
+        return resultsets.ResourceSet(self, query=query)
 
     def _construct_create_url(self, path):
         """
@@ -159,23 +156,21 @@ class ResourceManager(object):
         except KeyError as e:
             raise exceptions.ValidationError('{0} field is required'.format(e))
 
-        self.params = fields
-        self.container = self.resource_class.container_create
+        query = Query(url, fields, self.resource_class.container_create)
         request = self._prepare_create_request(formatter.unused_kwargs)
         response = self.facepp.engine.request(self.resource_class.http_method_create, url, data=request)
-        resource = self._process_create_response(request, response)
-        # self.url = self.facepp.url + self.resource_class.query_one.format(resource.internal_id, **fields)
-        return resource
+        return self._process_create_response(request, response, query)
 
-    def _process_create_response(self, request, response):
+    def _process_create_response(self, request, response, query):
         """
         Processes create response and constructs resource object.
 
         :param dict request: Original request data.
         :param any response: Response received from FacePP for this request data.
+        :param Query query: Query of the request, its params are the fields resource was created with.
         """
-        res = response[self.container] if self.container else response
-        return self.to_resource(dict(res, **self.params))
+        res = response[query.container] if query.container else response
+        return self.to_resource(dict(res, **query.params))
 
     def _construct_update_url(self, path):
         """
@@ -208,31 +203,25 @@ class ResourceManager(object):
         formatter = utilities.MemorizeFormatter()
 
         try:
-            query_update = formatter.format(self.resource_class.query_update, **fields)
+            url = self._construct_update_url(formatter.format(self.resource_class.query_update, **fields))
         except KeyError as e:
-            param = e.args[0]
-
-            if param in self.params:
-                fields[param] = self.params[param]
-                query_update = formatter.format(self.resource_class.query_update, **fields)
-            else:
-                raise exceptions.ValidationError('{0} argument is required'.format(e))
+            raise exceptions.ValidationError('{0} argument is required'.format(e))
 
-        url = self._construct_update_url(query_update)
-        self.container = self.resource_class.container_update
+        query = Query(url, fields, self.resource_class.container_update)
         request = self._prepare_update_request(formatter.unused_kwargs)
         response = self.facepp.engine.request(self.resource_class.http_method_update, url, data=request)
-        return self._process_update_response(request, response)
+        return self._process_update_response(request, response, query)
 
-    def _process_update_response(self, request, response):
+    def _process_update_response(self, request, response, query):
         """
         Processes update response.
 
         :param dict request: Original request data.
-        :param any response: Response received from Redmine for this request data.
+        :param any response: Response received from FacePP for this request data.
+        :param Query query: Query of the request, its params are the fields resource was updated with.
         """
-        res = response[self.container] if self.container else response
-        return self.to_resource(dict(res, **self.params))
+        res = response[query.container] if query.container else response
+        return self.to_resource(dict(res, **query.params))
 
     def _construct_delete_url(self, path):
         """
@@ -264,19 +253,21 @@ class ResourceManager(object):
         except KeyError as e:
             raise exceptions.ValidationError('{0} argument is required'.format(e))
 
+        query = Query(url, params, None)
         request = self._prepare_delete_request(params)
         response = self.facepp.engine.request(self.resource_class.http_method_delete, url, data=request)
-        return self._process_delete_response(request, response)
+        return self._process_delete_response(request, response, query)
 
-    def _process_delete_response(self, request, response):
+    def _process_delete_response(self, request, response, query):
         """
         Processes delete response.
 
         :param dict request: Original request data.
         :param any response: Response received from FacePP for this request data.
+        :param Query query: Query of the request, its params are the params resource was deleted with.
         """
-        res = response[self.container] if self.container else response
-        return self.to_resource(dict(res, **self.params))
+        res = response[query.container] if query.container else response
+        return self.to_resource(dict(res, **query.params))
 
     def __repr__(self):
         """
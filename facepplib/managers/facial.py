@@ -0,0 +1,391 @@
+"""
+Defines managers of facial recognition FacePP resources.
+"""
+
+import time
+
+from .. import exceptions
+from ..utilities import split_tokens
+from .base import ResourceManager
+
+
+def largest_face(faces):
+    """
+    Returns the largest face, FacePP compares and searches the largest face of an image as well.
+
+    :param list faces: (required). Faces data as it was received from FacePP.
+    """
+    return max(faces, key=lambda face: face['face_rectangle']['width'] * face['face_rectangle']['height'])
+
+
+class FaceManager(ResourceManager):
+    """
+    Manages Face resources, Face is retrieved from the local mirror while it's fresh and has the face,
+    retrieved faces and user ids that are set are recorded in the mirror.
+    """
+    def get(self, **params):
+        """
+        Returns a Face object with its user id and facesets from the local mirror if it's fresh and has the face
+        or from FacePP otherwise.
+
+        :param dict params: (optional). Parameters used for resource retrieval.
+        """
+        mirror = self.facepp.mirror
+
+        if mirror is not None and set(params) == {'face_token'} and mirror.is_fresh():
+            face = mirror.face(params['face_token'])
+            if face is not None:
+                return self.to_resource(face)
+
+        resource = super(FaceManager, self).get(**params)
+
+        if mirror is not None and 'facesets' in resource.raw():
+            mirror.save_face(dict(resource.raw(), face_token=resource.internal_id or params.get('face_token')))
+
+        return resource
+
+    def _process_update_response(self, request, response, query):
+        """
+        Processes update response and records user id in the local mirror.
+
+        :param dict request: Original request data.
+        :param any response: Response received from FacePP for this request data.
+        :param Query query: Query of the request.
+        """
+        if self.facepp.mirror is not None and 'user_id' in request:
+            self.facepp.mirror.set_user_id(response.get('face_token') or request['face_token'], request['user_id'])
+
+        return super(FaceManager, self)._process_update_response(request, response, query)
+
+
+class FaceSetManager(ResourceManager):
+    """
+    Manages FaceSet resources, FaceSet is retrieved from the local mirror while it's fresh
+    and changes made to facesets are recorded in the mirror.
+    """
+    def _faceset_token(self, request, response):
+        """
+        Returns token of the faceset the request was made for.
+
+        :param dict request: (required). Request data.
+        :param any response: (required). Response received from FacePP for this request data.
+        """
+        return response.get('faceset_token') or request.get('faceset_token') or \
+            self.facepp.mirror.faceset_token(request.get('outer_id'))
+
+    def get(self, **params):
+        """
+        Returns a FaceSet object from the local mirror if it's fresh and has the faceset or from FacePP otherwise.
+
+        :param dict params: (optional). Parameters used for resource retrieval.
+        """
+        mirror = self.facepp.mirror
+
+        if mirror is not None and params and set(params) <= {'faceset_token', 'outer_id', 'start'} and \
+                mirror.is_fresh():
+            faceset = mirror.faceset(**dict((key, params[key]) for key in params if key != 'start'))
+            if faceset is not None:
+                # Face tokens are paginated with start/next as getdetail does
+                start, chunk = int(params.get('start') or 1), self.resource_class.detail_chunk
+                tokens = faceset['face_tokens']
+                faceset['face_tokens'] = tokens[start - 1:start - 1 + chunk]
+                if len(tokens) >= start + chunk:
+                    faceset['next'] = str(start + chunk)
+                return self.to_resource(faceset)
+
+        return super(FaceSetManager, self).get(**params)
+
+    def _submit_async(self, operation, face_tokens, callback=None, **params):
+        """
+        Submits asynchronous faceset tasks for face tokens in chunks that FacePP accepts and returns a list
+        of Task handles. Finished tasks are recorded in the local mirror.
+
+        :param string operation: (required). Either addface or removeface.
+        :param list face_tokens: (required). Face tokens.
+        :param callback: (optional). Callable that accepts Task object, it's called when each task is finished.
+        :param dict params: (required). Faceset to change, either faceset_token or outer_id.
+        """
+        if 'faceset_token' not in params and 'outer_id' not in params:
+            raise exceptions.ValidationError('faceset_token or outer_id argument is required')
+
+        face_tokens = split_tokens(face_tokens)
+        url = self.facepp.url + '/facepp/v3/faceset/async/' + operation
+        tasks = []
+
+        def record(chunk):
+            def finished(task):
+                if self.facepp.mirror is None or task.future.exception() is not None:
+                    return
+                result = task.result()
+                failed = set(detail.get('face_token') for detail in result.get('failure_detail') or [])
+                faceset_token = self._faceset_token(params, result)
+                if faceset_token:
+                    change = getattr(self.facepp.mirror, 'add_faces' if operation == 'addface' else 'remove_faces')
+                    change(faceset_token, [token for token in chunk if token not in failed])
+            return finished
+
+        for i in range(0, len(face_tokens), self.resource_class.async_chunk):
+            chunk = face_tokens[i:i + self.resource_class.async_chunk]
+            response = self.facepp.engine.request('post', url, data=dict(params, face_tokens=','.join(chunk)))
+            task = self.facepp.task_poller.submit(response['task_id'], record(chunk))
+            if callback is not None:
+                task.add_done_callback(callback)
+            tasks.append(task)
+
+        return tasks
+
+    def add_faces_async(self, face_tokens, callback=None, **params):
+        """
+        Adds faces to the faceset with asynchronous tasks and returns a list of Task handles.
+
+        :param list face_tokens: (required). Face tokens.
+        :param callback: (optional). Callable that accepts Task object, it's called when each task is finished.
+        :param dict params: (required). Faceset to add faces to, either faceset_token or outer_id.
+        """
+        return self._submit_async('addface', face_tokens, callback, **params)
+
+    def remove_faces_async(self, face_tokens, callback=None, **params):
+        """
+        Removes faces from the faceset with asynchronous tasks and returns a list of Task handles,
+        RemoveAllFaceTokens removes all faces.
+
+        :param list face_tokens: (required). Face tokens.
+        :param callback: (optional). Callable that accepts Task object, it's called when each task is finished.
+        :param dict params: (required). Faceset to remove faces from, either faceset_token or outer_id.
+        """
+        return self._submit_async('removeface', face_tokens, callback, **params)
+
+    def _process_create_response(self, request, response, query):
+        """
+        Processes create response and records created faceset in the local mirror.
+
+        :param dict request: Original request data.
+        :param any response: Response received from FacePP for this request data.
+        :param Query query: Query of the request.
+        """
+        resource = super(FaceSetManager, self)._process_create_response(request, response, query)
+
+        if self.facepp.mirror is not None:
+            self.facepp.mirror.save_faceset(dict(request, **resource.raw()))
+
+        return resource
+
+    def _process_update_response(self, request, response, query):
+        """
+        Processes update response and records updated fields in the local mirror.
+
+        :param dict request: Original request data.
+        :param any response: Response received from FacePP for this request data.
+        :param Query query: Query of the request.
+        """
+        if self.facepp.mirror is not None:
+            faceset = dict((field, request[field]) for field in ('display_name', 'tags') if field in request)
+            if 'new_outer_id' in request:
+                faceset['outer_id'] = request['new_outer_id']
+
+            faceset_token = self._faceset_token(request, response)
+            if faceset_token:
+                self.facepp.mirror.save_faceset(dict(faceset, faceset_token=faceset_token))
+
+        return super(FaceSetManager, self)._process_update_response(request, response, query)
+
+    def _process_delete_response(self, request, response, query):
+        """
+        Processes delete response and removes deleted faceset from the local mirror.
+
+        :param dict request: Original request data.
+        :param any response: Response received from FacePP for this request data.
+        :param Query query: Query of the request.
+        """
+        if self.facepp.mirror is not None:
+            faceset_token = self._faceset_token(request, response)
+            if faceset_token:
+                self.facepp.mirror.delete_faceset(faceset_token)
+
+        return super(FaceSetManager, self)._process_delete_response(request, response, query)
+
+
+class CompareManager(ResourceManager):
+    """
+    Manages Compare resources, many images can be compared with each other at once.
+    """
+    def matrix(self, images, others=None, as_array=False, timeout=None):
+        """
+        Compares each image with each other image and returns a dense matrix of confidences, rows are images
+        and columns are others. Each image is detected only once and pairs are compared by face tokens
+        concurrently. Symmetric pairs are compared once, pairs of the same face aren't compared and
+        confidences are cached per FacePP object, so repeated pairs don't make requests. Confidence is None
+        (NaN in array) for the same face, images without faces and pairs which compare failed.
+
+        :param list images: (required). Image params dicts, i.e. [{'image_url': ...}, {'face_token': ...}].
+        :param list others: (optional). Image params dicts to compare images with, defaults to images.
+        :param bool as_array: (optional). Whether to return a float32 NumPy array instead of a list of lists.
+        :param float timeout: (optional). Max number of seconds a single compare may take.
+        """
+        if as_array:
+            from .. import arrays  # NumPy is imported only when it's needed
+            if arrays.numpy is None:
+                raise exceptions.OptionalDependencyError('numpy')
+
+        others = images if others is None else others
+        keys = [tuple(sorted(image.items())) for image in list(images) + list(others)]
+        unique = [dict(key) for key in sorted(set(keys))]
+
+        def detect(image):
+            if 'face_token' in image:
+                return image['face_token']
+            faces = self.new_manager('Image').get(**image).raw().get('faces')
+            return largest_face(faces)['face_token'] if faces else None
+
+        tokens = dict(zip([tuple(sorted(image.items())) for image in unique], self.facepp.engine.map(detect, unique)))
+        rows = [tokens[key] for key in keys[:len(images)]]
+        columns = [tokens[key] for key in keys[len(images):]]
+
+        cache = self.facepp.compare_cache
+        confidences, pairs = {}, set()
+
+        for row in rows:
+            for column in columns:
+                if row and column and row != column:
+                    pair = frozenset((row, column))
+                    if pair not in confidences:
+                        confidences[pair] = cache.get(pair)
+                    if confidences[pair] is None:
+                        pairs.add(tuple(sorted(pair)))
+
+        pairs = sorted(pairs)
+        url = self.facepp.url + self.resource_class.query_one
+
+        def compare(face_token1, face_token2):
+            return self.facepp.engine.request('post', url, data={
+                'face_token1': face_token1, 'face_token2': face_token2})['confidence']
+
+        errors = []
+
+        for pair, (confidence, error) in zip(pairs, self.facepp.engine.settle(compare, *zip(*pairs), timeout=timeout)
+                                             if pairs else []):
+            if error is not None:
+                errors.append(error)
+            else:
+                confidences[frozenset(pair)] = confidence
+                cache.set(frozenset(pair), confidence)
+
+        if pairs and len(errors) == len(pairs):
+            raise errors[0]
+
+        matrix = [[confidences.get(frozenset((row, column))) if row and column and row != column else None
+                   for column in columns] for row in rows]
+
+        if as_array:
+            return arrays.matrix(matrix).reshape(len(rows), len(columns))
+
+        return matrix
+
+
+class SearchManager(ResourceManager):
+    """
+    Manages Search resources, a single probe can be searched in many facesets at once
+    and all faces of an image can be searched at once.
+    """
+    def sharded(self, faceset_tokens=None, outer_ids=None, return_result_count=5, threshold=None, timeout=None,
+                **params):
+        """
+        Searches a face in all given facesets (shards) concurrently and returns a Search object with the results
+        of all shards merged by confidence. The image is detected only once and its face token is reused
+        for every shard. Shards that failed or timed out are reported in the failures attribute, results of
+        the others are still returned.
+
+        :param list faceset_tokens: (optional). Tokens of facesets to search in.
+        :param list outer_ids: (optional). Outer ids of facesets to search in.
+        :param int return_result_count: (optional). Number of merged results to return.
+        :param string threshold: (optional). Key of the thresholds returned by FacePP, i.e. 1e-4. Results with
+                                 a lower confidence are dropped.
+        :param float timeout: (optional). Max number of seconds a single shard search may take.
+        :param dict params: (optional). Image to search, i.e. image_url, or a face_token.
+        """
+        shards = [('faceset_token', token) for token in faceset_tokens or []] + \
+                 [('outer_id', outer_id) for outer_id in outer_ids or []]
+
+        if not shards:
+            raise exceptions.ValidationError('faceset_tokens or outer_ids argument is required')
+
+        search = dict(params)
+
+        if 'face_token' not in params:
+            image = self.new_manager('Image').get(**params).raw()
+            search.update(image_id=image.get('image_id'), faces=image.get('faces') or [])
+            if not search['faces']:
+                return self.to_resource(dict(search, results=[], failures={}))
+
+            search['face_token'] = largest_face(search['faces'])['face_token']
+
+        url = self.facepp.url + self.resource_class.query_one
+
+        def search_shard(key, value):
+            return self.facepp.engine.request('post', url, data={
+                key: value, 'face_token': search['face_token'], 'return_result_count': min(return_result_count, 5)})
+
+        responses = self.facepp.engine.settle(search_shard, *zip(*shards), timeout=timeout)
+        results, failures = [], {}
+
+        for (key, value), (response, error) in zip(shards, responses):
+            if error is not None:
+                failures[value] = error
+                continue
+
+            search.setdefault('thresholds', response.get('thresholds'))
+            search.setdefault('request_id', response.get('request_id'))
+            results.extend(dict(result, shard=value) for result in response.get('results') or [])
+
+        if len(failures) == len(shards):
+            raise failures[shards[0][1]]
+
+        if threshold is not None:
+            try:
+                results = [result for result in results if result['confidence'] >= search['thresholds'][threshold]]
+            except (KeyError, TypeError):
+                raise exceptions.ValidationError('{0} threshold is not returned by FacePP'.format(threshold))
+
+        results.sort(key=lambda result: result['confidence'], reverse=True)
+        return self.to_resource(dict(search, results=results[:return_result_count], failures=failures))
+
+    def crowd(self, faceset_token=None, outer_id=None, return_result_count=1, timeout=None, **params):
+        """
+        Searches every face detected on the image concurrently and returns a Search object which searches
+        attribute holds a Search object per face in the order of image faces. The image is detected only once,
+        faces are searched by their face tokens. Faces which search failed or timed out have no results and
+        are reported in the failures attribute. Time_used is the sum of FacePP processing time of all requests
+        and elapsed is the wall clock time of the whole operation, both in milliseconds.
+
+        :param string faceset_token: (optional). Token of faceset to search in.
+        :param string outer_id: (optional). Outer id of faceset to search in.
+        :param int return_result_count: (optional). Number of results to return per face.
+        :param float timeout: (optional). Max number of seconds a single face search may take.
+        :param dict params: (optional). Image to search faces of, i.e. image_url.
+        """
+        if not faceset_token and not outer_id:
+            raise exceptions.ValidationError('faceset_token or outer_id argument is required')
+
+        started = time.time()
+        image = self.new_manager('Image').get(**params).raw()
+        faces = image.get('faces') or []
+        url = self.facepp.url + self.resource_class.query_one
+        faceset = {'faceset_token': faceset_token} if faceset_token else {'outer_id': outer_id}
+
+        def search_face(face):
+            return self.facepp.engine.request('post', url, data=dict(
+                faceset, face_token=face['face_token'], return_result_count=return_result_count))
+
+        searches, failures = [], {}
+        time_used = image.get('time_used') or 0
+
+        for face, (response, error) in zip(faces, self.facepp.engine.settle(search_face, faces, timeout=timeout)):
+            if error is not None:
+                failures[face['face_token']] = error
+                response = {'results': []}
+            time_used += response.get('time_used') or 0
+            searches.append(dict(response, face_token=face['face_token'], face_rectangle=face.get('face_rectangle')))
+
+        return self.to_resource(dict(params, image_id=image.get('image_id'), faces=faces, searches=searches,
+                                     failures=failures, time_used=time_used,
+                                     elapsed=int((time.time() - started) * 1000)))
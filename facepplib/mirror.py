@@ -0,0 +1,262 @@
+"""
+Provides an optional local mirror of facesets, their face tokens and user ids.
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+
+from .utilities import split_tokens
+
+schema = '''
+CREATE TABLE IF NOT EXISTS facesets (
+    faceset_token TEXT PRIMARY KEY,
+    outer_id TEXT,
+    display_name TEXT,
+    tags TEXT
+);
+CREATE INDEX IF NOT EXISTS facesets_outer_id ON facesets (outer_id);
+CREATE TABLE IF NOT EXISTS members (
+    faceset_token TEXT,
+    face_token TEXT,
+    PRIMARY KEY (faceset_token, face_token)
+);
+CREATE INDEX IF NOT EXISTS members_face_token ON members (face_token);
+CREATE TABLE IF NOT EXISTS faces (
+    face_token TEXT PRIMARY KEY,
+    user_id TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL
+);
+'''
+
+
+class FaceSetMirror(object):
+    """
+    Local SQLite mirror of facesets, their face tokens and user ids. It's populated by a paginated bulk
+    sync, kept current by FaceSet and Face hooks, and consulted instead of FacePP while it's fresh. User ids
+    aren't part of the sync, faces are recorded when they are retrieved or their user id is set.
+    """
+    def __init__(self, path=':memory:', max_age=3600):
+        """
+        :param string path: (optional). SQLite database path, in memory database by default.
+        :param int max_age: (optional). Seconds since the last sync the mirror is considered fresh for.
+        """
+        self.max_age = max_age
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(schema)
+
+    def _select(self, query, *args):
+        """
+        Returns all rows of the select query.
+
+        :param string query: (required). SQL query.
+        :param args: (optional). Query parameters.
+        """
+        with self.lock:
+            return self.connection.execute(query, args).fetchall()
+
+    def _execute(self, *statements):
+        """
+        Executes statements in a single transaction.
+
+        :param statements: (required). Tuples of SQL statement and its parameters list.
+        """
+        with self.lock:
+            with self.connection:
+                for statement, params in statements:
+                    self.connection.executemany(statement, params)
+
+    @property
+    def synced_at(self):
+        """
+        Returns timestamp of the last sync or None if mirror was never synced.
+        """
+        rows = self._select('SELECT value FROM meta WHERE key = ?', 'synced_at')
+        return rows[0][0] if rows else None
+
+    def is_fresh(self):
+        """
+        Checks whether the mirror was synced less than max_age seconds ago.
+        """
+        synced_at = self.synced_at
+        return synced_at is not None and time.time() - synced_at < self.max_age
+
+    def sync(self, facepp):
+        """
+        Replaces mirror data with all facesets and their face tokens retrieved from FacePP. Facesets are
+        paginated with start/next and face tokens of different facesets are retrieved concurrently.
+
+        :param facepp.FacePP facepp: (required). FacePP object.
+        """
+        engine, synced_at = facepp.engine, time.time()
+        facesets = [faceset for page in engine.iter_pages(
+            'post', facepp.url + '/facepp/v3/faceset/getfacesets', 'facesets', limit=sys.maxsize) for faceset in page]
+
+        def face_tokens(faceset):
+            return [token for page, _ in engine.pages(
+                'post', facepp.url + '/facepp/v3/faceset/getdetail', 'face_tokens',
+                faceset_token=faceset['faceset_token'], limit=sys.maxsize) for token in page]
+
+        members = engine.map(face_tokens, facesets)
+
+        self._execute(
+            ('DELETE FROM facesets', [()]),
+            ('DELETE FROM members', [()]),
+            ('INSERT INTO facesets VALUES (?, ?, ?, ?)', [
+                (faceset['faceset_token'], faceset.get('outer_id'), faceset.get('display_name'), faceset.get('tags'))
+                for faceset in facesets]),
+            ('INSERT OR IGNORE INTO members VALUES (?, ?)', [
+                (faceset['faceset_token'], token) for faceset, tokens in zip(facesets, members) for token in tokens]),
+            ('INSERT OR REPLACE INTO meta VALUES (?, ?)', [('synced_at', synced_at)]))
+        return self
+
+    def faceset(self, faceset_token=None, outer_id=None):
+        """
+        Returns faceset data with its face tokens and face count or None if faceset isn't mirrored.
+
+        :param string faceset_token: (optional). FaceSet token.
+        :param string outer_id: (optional). FaceSet outer id.
+        """
+        rows = self._select('SELECT faceset_token, outer_id, display_name, tags FROM facesets WHERE {0} = ?'.format(
+            'faceset_token' if faceset_token else 'outer_id'), faceset_token or outer_id)
+        if not rows:
+            return None
+
+        faceset = dict(zip(('faceset_token', 'outer_id', 'display_name', 'tags'), rows[0]))
+        faceset['face_tokens'] = [row[0] for row in self._select(
+            'SELECT face_token FROM members WHERE faceset_token = ? ORDER BY rowid', faceset['faceset_token'])]
+        faceset['face_count'] = len(faceset['face_tokens'])
+        return faceset
+
+    def faceset_token(self, outer_id):
+        """
+        Returns token of the faceset by outer id or None if faceset isn't mirrored.
+
+        :param string outer_id: (required). FaceSet outer id.
+        """
+        rows = self._select('SELECT faceset_token FROM facesets WHERE outer_id = ?', outer_id)
+        return rows[0][0] if rows else None
+
+    def facesets_of(self, face_token):
+        """
+        Returns a list with data of facesets the face is in.
+
+        :param string face_token: (required). Face token.
+        """
+        return [dict(zip(('faceset_token', 'outer_id', 'display_name', 'tags'), row)) for row in self._select(
+            'SELECT f.faceset_token, f.outer_id, f.display_name, f.tags FROM facesets f '
+            'JOIN members m ON m.faceset_token = f.faceset_token WHERE m.face_token = ?', face_token)]
+
+    def face_counts(self, prefix=None):
+        """
+        Returns a dict with number of faces by faceset outer id, facesets without outer id are skipped.
+
+        :param string prefix: (optional). Count faces only of facesets which outer id starts with the prefix.
+        """
+        return dict(row for row in self._select(
+            'SELECT f.outer_id, COUNT(m.face_token) FROM facesets f '
+            'LEFT JOIN members m ON m.faceset_token = f.faceset_token '
+            'WHERE f.outer_id IS NOT NULL AND f.outer_id != \'\' GROUP BY f.faceset_token')
+            if prefix is None or row[0].startswith(prefix))
+
+    def user_id(self, face_token):
+        """
+        Returns user id of the face, an empty string if it has none, or None if face isn't mirrored.
+
+        :param string face_token: (required). Face token.
+        """
+        rows = self._select('SELECT user_id FROM faces WHERE face_token = ?', face_token)
+        return rows[0][0] or '' if rows else None
+
+    def face(self, face_token):
+        """
+        Returns face data with its user id and facesets as getdetail does or None if face isn't mirrored.
+
+        :param string face_token: (required). Face token.
+        """
+        user_id = self.user_id(face_token)
+        if user_id is None:
+            return None
+
+        return {'face_token': face_token, 'user_id': user_id, 'facesets': self.facesets_of(face_token)}
+
+    def save_face(self, face):
+        """
+        Records user id of the face and replaces its memberships with the facesets it's in.
+
+        :param dict face: (required). Face data, i.e. as it was received from getdetail.
+        """
+        token = face['face_token']
+        facesets = [faceset for faceset in face.get('facesets') or [] if faceset.get('faceset_token')]
+
+        self._execute(
+            ('INSERT OR REPLACE INTO faces VALUES (?, ?)', [(token, face.get('user_id') or '')]),
+            ('DELETE FROM members WHERE face_token = ?', [(token,)]))
+        for faceset in facesets:
+            self.save_faceset(dict(faceset, face_tokens=[token]))
+
+    def save_faceset(self, faceset):
+        """
+        Adds or updates faceset, its face tokens are added if provided.
+
+        :param dict faceset: (required). FaceSet data, i.e. as it was received from FacePP.
+        """
+        token = faceset['faceset_token']
+        fields = [field for field in ('outer_id', 'display_name', 'tags') if field in faceset]
+        statements = [('INSERT OR IGNORE INTO facesets (faceset_token) VALUES (?)', [(token,)])]
+
+        if fields:
+            statements.append(('UPDATE facesets SET {0} WHERE faceset_token = ?'.format(
+                ', '.join('{0} = ?'.format(field) for field in fields)),
+                [tuple(faceset[field] for field in fields) + (token,)]))
+
+        self._execute(*statements)
+        self.add_faces(token, faceset.get('face_tokens'))
+
+    def delete_faceset(self, faceset_token):
+        """
+        Deletes faceset and its membership data.
+
+        :param string faceset_token: (required). FaceSet token.
+        """
+        self._execute(('DELETE FROM members WHERE faceset_token = ?', [(faceset_token,)]),
+                      ('DELETE FROM facesets WHERE faceset_token = ?', [(faceset_token,)]))
+
+    def add_faces(self, faceset_token, face_tokens):
+        """
+        Adds faces to the faceset.
+
+        :param string faceset_token: (required). FaceSet token.
+        :param list face_tokens: (required). Face tokens.
+        """
+        self._execute(('INSERT OR IGNORE INTO members VALUES (?, ?)', [
+            (faceset_token, token) for token in split_tokens(face_tokens)]))
+
+    def remove_faces(self, faceset_token, face_tokens):
+        """
+        Removes faces from the faceset, RemoveAllFaceTokens removes all faces as FacePP does.
+
+        :param string faceset_token: (required). FaceSet token.
+        :param list face_tokens: (required). Face tokens.
+        """
+        face_tokens = split_tokens(face_tokens)
+
+        if face_tokens == ['RemoveAllFaceTokens']:
+            self._execute(('DELETE FROM members WHERE faceset_token = ?', [(faceset_token,)]))
+        else:
+            self._execute(('DELETE FROM members WHERE faceset_token = ? AND face_token = ?', [
+                (faceset_token, token) for token in face_tokens]))
+
+    def set_user_id(self, face_token, user_id):
+        """
+        Sets user id of the face.
+
+        :param string face_token: (required). Face token.
+        :param string user_id: (required). User id.
+        """
+        self._execute(('INSERT OR REPLACE INTO faces VALUES (?, ?)', [(face_token, user_id)]))
@@ -6,7 +6,7 @@ from __future__ import unicode_literals
 
 from datetime import date, datetime
 
-from .. import managers, utilities, exceptions
+from .. import managers, utilities, exceptions, jsonlib
 
 
 registry = {}
@@ -20,6 +20,7 @@ class Registrar(type):
     """
     def __new__(mcs, name, bases, attrs):
         cls = super(Registrar, mcs).__new__(mcs, name, bases, attrs)
+        mcs.update_cls_meta(cls)
 
         if name.startswith('Base'):  # base classes shouldn't be added to the registry
             return cls
@@ -84,6 +85,23 @@ class Registrar(type):
             return
 
         setattr(cls, name, value)
+        Registrar.update_cls_meta(cls)
+
+    @staticmethod
+    def update_cls_meta(cls):
+        """
+        Computes metadata that every instance of the resource class needs, so that it's computed only
+        once per class and not on every instantiation. Should be called again whenever relations or
+        includes of the class change.
+
+        :param any cls: (required). Resource class.
+        """
+        relations_includes = list(cls._relations) + list(cls._includes)
+
+        cls._default_attrs = dict.fromkeys(relations_includes)
+        cls._create_readonly_attrs = frozenset(list(cls._create_readonly) + relations_includes)
+        cls._update_readonly_attrs = frozenset(list(cls._update_readonly) + relations_includes)
+        cls._relations_filter = '{0}_id'.format(cls._relations_name or cls.__name__.lower())
 
 
 @utilities.fix_unicode
@@ -102,6 +120,7 @@ class BaseResource(utilities.with_metaclass(Registrar)):
     query_all = None
     query_one = None
     query_filter = None
+    query_filter_chunk = None  # Max number of resource ids a filter request accepts.
     query_create = None
     query_update = None
     query_delete = None
@@ -111,13 +130,19 @@ class BaseResource(utilities.with_metaclass(Registrar)):
     manager_class = managers.ResourceManager
 
     _repr = [['request_id']]
+    _record = None  # Fields of records returned by ResourceSet.records(), defaults to internal_id_key
     _includes = []
+    _includes_map = {}  # Includes that FacePP returns under another name
     _relations = []
     _relations_name = None
     _unconvertible = ['request_id', 'time_used']
     _members = ['manager']
     _create_readonly = []
     _update_readonly = _create_readonly[:]
+    _create_readonly_attrs = frozenset()  # Computed by Registrar from _create_readonly, _relations and _includes
+    _update_readonly_attrs = frozenset()  # Computed by Registrar from _update_readonly, _relations and _includes
+    _default_attrs = {}  # Computed by Registrar, attributes every new resource starts with
+    _relations_filter = None  # Computed by Registrar, filter name relations are retrieved by, i.e. image_id
     _attach_includes = None
     _attach_relations = None
     _resource_map = {}  # Resources that should become a Resource object
@@ -131,17 +156,12 @@ class BaseResource(utilities.with_metaclass(Registrar)):
         :param managers.ResourceManager manager: (required). Manager object.
         :param dict attributes: (required). Resource attributes.
         """
-        relations_includes = self._relations + self._includes
-
-        self.manager = manager
-        self._create_readonly += relations_includes
-        self._update_readonly += relations_includes
-        self._decoded_attrs = dict(dict.fromkeys(relations_includes), **attributes)
-        self._encoded_attrs = {}
-        self._changes = {}
-
-        if self._relations_name is None:
-            self._relations_name = self.__class__.__name__.lower()
+        # Members are stored directly because they don't need any of the __setattr__ checks
+        members = self.__dict__
+        members['manager'] = manager
+        members['_decoded_attrs'] = dict(self._default_attrs, **attributes)
+        members['_encoded_attrs'] = {}
+        members['_changes'] = {}
 
     def __getitem__(self, item):
         """
@@ -169,11 +189,13 @@ class BaseResource(utilities.with_metaclass(Registrar)):
 
         # Else this is the first time access and we need to encode the attribute
         decoded = self._decoded_attrs.get(attr)
+        if isinstance(decoded, jsonlib.LazyJSON):
+            decoded = self._decoded_attrs[attr] = decoded.decode()
         if decoded is not None:
             attr, encoded = self.encode(attr, decoded, self.manager)
         elif attr in self._relations:
             # i.e. { 'image_id': self.internal_id }
-            filters = {'{0}_id'.format(self._relations_name): self.internal_id}
+            filters = {self._relations_filter: self.internal_id}
             encoded = self.manager.new_manager(self._resource_set_map[attr]).filter(**filters)
         elif attr in self._includes:
             if 'attributes' in self._decoded_attrs:
@@ -208,9 +230,9 @@ class BaseResource(utilities.with_metaclass(Registrar)):
         """
         if attr in self._members or attr.startswith('_'):
             return super(BaseResource, self).__setattr__(attr, value)
-        elif attr in self._create_readonly and self.is_new():
+        elif attr in self._create_readonly_attrs and self.is_new():
             raise exceptions.ReadonlyAttrError
-        elif attr in self._update_readonly and not self.is_new():
+        elif attr in self._update_readonly_attrs and not self.is_new():
             raise exceptions.ReadonlyAttrError
         else:
             decoded_attr, decoded_value = self.decode(attr, value, self.manager)
@@ -315,7 +337,7 @@ class BaseResource(utilities.with_metaclass(Registrar)):
         """
         Returns resource data as it was received from FacePP.
         """
-        return self._decoded_attrs
+        return jsonlib.unwrap(self._decoded_attrs)
 
     def refresh(self, itself=True, **params):
         """
@@ -324,7 +346,7 @@ class BaseResource(utilities.with_metaclass(Registrar)):
         :param bool itself: (optional). Whether to refresh itself or return a new resource.
         :param dict params: (optional). Parameters used for resource retrieval.
         """
-        resource = self.manager.get(self.internal_id, **params)
+        resource = self.manager.get(**dict(params, **{self.internal_id_key: self.internal_id}))
 
         if itself:
             self._encoded_attrs = {}
@@ -396,7 +418,7 @@ class BaseResource(utilities.with_metaclass(Registrar)):
         :param dict params: (optional). Parameters used for resource deletion.
         """
         self.pre_delete()
-        response = self.manager.delete(self.internal_id, **params)
+        response = self.manager.delete(**dict(params, **{self.internal_id_key: self.internal_id}))
         self.post_delete()
         return response
 
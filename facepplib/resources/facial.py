@@ -4,7 +4,9 @@ Defines facial recognition FacePP resources and resource mappings.
 
 from __future__ import unicode_literals
 
-from .. import exceptions
+import threading
+
+from .. import exceptions, managers
 from . import BaseResource
 
 
@@ -20,6 +22,7 @@ class Image(BaseResource):
 
 
 class Base4TryGenerateImage(BaseResource):
+    _detections_lock = threading.Lock()  # Guards creation of detections cache of all resources
 
     def _get_image(self, idx=None):
 
@@ -47,7 +50,7 @@ class Base4TryGenerateImage(BaseResource):
                 image['faces'] = faces
                 return image
             else:
-                return self.manager.facepp.image.get(**image).raw()
+                return self._detect_image(image)
 
         raise_attr_exception = self.manager.facepp.raise_attr_exception
 
@@ -58,6 +61,23 @@ class Base4TryGenerateImage(BaseResource):
 
         return None
 
+    def _detect_image(self, image):
+        """
+        Detects faces on the image only once per resource. Accessors that need the same image
+        share the result and concurrent accessors wait until the first detection finishes.
+
+        :param dict image: (required). Image params, i.e. image_url.
+        """
+        with self._detections_lock:
+            detections = self.__dict__.setdefault('_detections', {})
+            detection = detections.setdefault(tuple(sorted(image.items())), [threading.Lock(), None])
+
+        with detection[0]:
+            if detection[1] is None:
+                detection[1] = self.manager.facepp.image.get(**image).raw()
+
+        return detection[1]
+
     def _getattr(self, attr, default=None):
         try:
             return super(Base4TryGenerateImage, self).__getattr__(attr)
@@ -68,16 +88,22 @@ class Base4TryGenerateImage(BaseResource):
 
 class Face(Base4TryGenerateImage):
     internal_id_key = 'face_token'
+    manager_class = managers.FaceManager
     container_all = 'faces'
     container_filter = 'faces'
     query_all = '/facepp/v3/detect'
     query_one = '/facepp/v3/face/getdetail'
     query_filter = '/facepp/v3/face/analyze'
+    query_filter_chunk = 5
     query_update = '/facepp/v3/face/setuserid'
 
     _repr = [['face_token', 'user_id']]
+    _record = ['face_token', 'face_rectangle', 'attributes']
     _includes = ['gender', 'age', 'smiling', 'smile', 'headpose', 'facequality', 'blur', 'eyestatus',
                  'emotion', 'ethnicity', 'beauty', 'mouthstatus', 'eyegaze', 'skinstatus']
+    _includes_map = {
+        'smiling': 'smile'
+    }
     _resource_map = {
         'faceset_token': 'FaceSet',
         'out_id': 'FaceSet'
@@ -107,6 +133,17 @@ class Face(Base4TryGenerateImage):
 
         return super(Face, self).__getattr__(attr)
 
+    def landmarks(self):
+        """
+        Returns landmark as a float32 (n_points, 2) array with a name index. Landmark is decoded
+        on the first call only. Requires NumPy to be installed.
+        """
+        decoded = self._encoded_attrs.get('landmarks')
+        if decoded is None:
+            from .. import landmarks  # NumPy is imported only when it's needed
+            decoded = self._encoded_attrs['landmarks'] = landmarks.Landmarks.from_payload(self.landmark)
+        return decoded
+
     @classmethod
     def construct_query_filter_path_and_container(cls, manager, **filters):
         """
@@ -145,28 +182,49 @@ class Face(Base4TryGenerateImage):
         Tasks that should be done before updating the Resource.
         """
         if 'outer_ids' in self._changes or 'faceset_tokens' in self._changes:
+            # Changes are always written through to the mirror, but it's read only while it's fresh
+            mirror = self.manager.facepp.mirror
+            fresh = mirror is not None and mirror.is_fresh()
+
             # Delete from all FaceSet
-            tokens = [item.faceset_token for item in self.manager.facepp.face.get(
-                **{self.internal_id_key: self.internal_id}).facesets]
+            if fresh:
+                tokens = [faceset['faceset_token'] for faceset in mirror.facesets_of(self.internal_id)]
+            else:
+                tokens = [item.faceset_token for item in self.manager.facepp.face.get(
+                    **{self.internal_id_key: self.internal_id}).facesets]
             for token in tokens:
                 url = self.manager.facepp.url + '/facepp/v3/faceset/removeface'
-                data = {'faceset_token': token, self.internal_id_key: self.internal_id}
+                data = {'faceset_token': token, 'face_tokens': self.internal_id}
                 self.manager.facepp.engine.request('post', url, data=data)
+                if mirror is not None:
+                    mirror.remove_faces(token, [self.internal_id])
+
+            # Face is in no faceset now, stale memberships the mirror may still have are dropped too
+            if mirror is not None:
+                for faceset in mirror.facesets_of(self.internal_id):
+                    mirror.remove_faces(faceset['faceset_token'], [self.internal_id])
 
             # Add to FaceSet
             url = self.manager.facepp.url + '/facepp/v3/faceset/addface'
+            data = []
 
             for outer_id in self._changes['outer_ids'].split(',') if 'outer_ids' in self._changes else []:
                 if not outer_id.strip():
                     continue
-                data = {'outer_id': outer_id, 'face_tokens': self.face_token}
-                self.manager.facepp.engine.request('post', url, data=data)
+                data.append({'outer_id': outer_id, 'face_tokens': self.face_token})
 
             for token in self._changes['faceset_tokens'].split(',') if 'faceset_tokens' in self._changes else []:
                 if not token.strip():
                     continue
-                data = {'faceset_token': token, 'face_tokens': self.face_token}
-                self.manager.facepp.engine.request('post', url, data=data)
+                data.append({'faceset_token': token, 'face_tokens': self.face_token})
+
+            for item in data:
+                response = self.manager.facepp.engine.request('post', url, data=item)
+                if mirror is not None:
+                    token = item.get('faceset_token') or response.get('faceset_token') or \
+                        mirror.faceset_token(item['outer_id'])
+                    if token:
+                        mirror.add_faces(token, [self.internal_id])
 
     def save(self, **attrs):
         """
@@ -193,17 +251,22 @@ class Face(Base4TryGenerateImage):
 
 class FaceSet(BaseResource):
     internal_id_key = 'faceset_token'
+    manager_class = managers.FaceSetManager
     container_all = 'facesets'
     query_all = '/facepp/v3/faceset/getfacesets'
     query_one = '/facepp/v3/faceset/getdetail'
     query_create = '/facepp/v3/faceset/create'
     query_update = '/facepp/v3/faceset/update'
     query_delete = '/facepp/v3/faceset/delete'
+    async_chunk = 1000  # Max number of face tokens FacePP accepts in a single asynchronous task
+    detail_chunk = 100  # Max number of face tokens FacePP returns in a single getdetail page
 
     _repr = [['faceset_token', 'outer_id', 'display_name']]
+    _record = ['faceset_token', 'outer_id', 'display_name', 'tags']
 
 
 class Compare(Base4TryGenerateImage):
+    manager_class = managers.CompareManager
     query_one = '/facepp/v3/compare'
 
     _unconvertible = ['request_id', 'time_used', 'confidence']
@@ -232,14 +295,17 @@ class Compare(Base4TryGenerateImage):
 
 
 class Search(Base4TryGenerateImage):
+    manager_class = managers.SearchManager
     query_one = '/facepp/v3/search'
 
-    _unconvertible = ['request_id', 'time_used', 'confidence', 'user_id']
+    _unconvertible = ['request_id', 'time_used', 'confidence', 'user_id', 'thresholds', 'failures', 'elapsed']
     _resource_map = {
         'image': 'Image'
     }
     _resource_set_map = {
-        'results': 'Face'
+        'results': 'Face',
+        'faces': 'Face',
+        'searches': 'Search'
     }
     # _single_attr_id_map = {
     #     'image_id': 'Image'
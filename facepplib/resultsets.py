@@ -2,24 +2,28 @@
 Defines ResourceSet objects that can be used to represent a set of resources.
 """
 
-import itertools
+import collections
 
-from . import exceptions
+from . import exceptions, jsonlib
+
+records_classes = {}
 
 
 class BaseResourceSet(object):
     """
     Defines basic functionality for a ResourceSet object.
     """
-    def __init__(self, manager, resources=None, limit=0, start=1):
+    def __init__(self, manager, resources=None, limit=0, start=1, query=None):
         """
         :param managers.ResourceManager manager: (required). ResourceManager object.
         :param resources: (optional). Iterable of resources.
         :type resources: list or tuple
         :param int limit: (optional). Resource limit.
         :param int start: (optional). Resource offset.
+        :param managers.Query query: (optional). Query resources are requested with if they aren't provided.
         """
         self.manager = manager
+        self.query = query
         self.limit = limit
         self.start = start
         self._next_start = None
@@ -35,7 +39,7 @@ class BaseResourceSet(object):
         :type resources: list or tuple
         :param dict kwargs: (optional). Additional keyword arguments if any.
         """
-        return cls(self.manager, resources=resources, limit=self.limit, offset=self.start, **kwargs)
+        return cls(self.manager, resources=resources, limit=self.limit, start=self.start, query=self.query, **kwargs)
 
     def __getitem__(self, item):
         """
@@ -47,32 +51,70 @@ class BaseResourceSet(object):
             self._is_sliced = True
         elif isinstance(item, int):
             try:
-                return next(itertools.islice(self, item, item + 1))
-            except StopIteration:
+                return self._to_resource(self._evaluate()[item])
+            except IndexError:
                 raise exceptions.ResourceSetIndexError
 
         if self._resources is not None and self._is_sliced:
-            return self._resource_cls(self.__class__, [resource for resource in BaseResourceSet.__iter__(self)])
+            return self._resource_cls(self.__class__, self._evaluate())
 
         return self
 
-    def __iter__(self):
+    def _to_resource(self, resource):
         """
-        Returns requested resources in a lazy fashion.
+        Converts resource data, stored in a ResourceSet, to the form that is returned to the user.
+
+        :param dict resource: (required). Resource data.
+        """
+        return resource
+
+    def _requirements_error(self, error):
+        """
+        Returns an exception that should be raised if requested resources weren't found.
+
+        :param exceptions.ResourceNotFoundError error: (required). Raised exception.
+        """
+        if self.manager.resource_class.requirements:
+            return exceptions.ResourceRequirementsError(self.manager.resource_class.requirements)
+        return error
+
+    def _params(self):
+        """
+        Returns request params of the query with limit and start of a ResourceSet.
+        """
+        params = dict(self.query.params) if self.query else {}
+        params.setdefault('limit', self.limit)
+        params.setdefault('start', self.start)
+        return params
+
+    def _is_chunked(self):
+        """
+        Checks whether resources are requested by a list of ids split into chunks.
+        """
+        resource_class = self.manager.resource_class
+        return bool(self.query and resource_class.query_filter_chunk and
+                    resource_class.internal_id_key + 's' in self.query.params)
+
+    def _evaluate(self):
+        """
+        Returns a list with requested resources data, resources are requested from FacePP on the first call.
         """
         # If this is the first time we are evaluating the ResourceSet
         # all the hard part will be done by the active Engine object
         if self._resources is None:
-            self.manager.params.setdefault('limit', self.limit)
-            self.manager.params.setdefault('start', self.start)
+            resource_class = self.manager.resource_class
+            engine = self.manager.facepp.engine
 
             try:
-                self._resources, self._next_start = self.manager.facepp.engine.bulk_request(
-                    'post', self.manager.url, self.manager.container, **self.manager.params)
+                if self._is_chunked():
+                    self._resources, self._next_start = engine.chunked_request(
+                        'post', self.query.url, self.query.container, resource_class.internal_id_key + 's',
+                        resource_class.query_filter_chunk, **self._params())
+                else:
+                    self._resources, self._next_start = engine.bulk_request(
+                        'post', self.query.url, self.query.container, **self._params())
             except exceptions.ResourceNotFoundError as e:
-                if self.manager.resource_class.requirements:
-                    raise exceptions.ResourceRequirementsError(self.manager.resource_class.requirements)
-                raise e
+                raise self._requirements_error(e)
 
             resources = self._resources
         # Otherwise ResourceSet object should handle slicing by itself
@@ -91,13 +133,54 @@ class BaseResourceSet(object):
             resources = self._resources
 
         self._is_sliced = False
-        return (resource for resource in resources)
+        return resources
+
+    def _stream(self):
+        """
+        Yields requested resources data page by page as soon as each page arrives from FacePP, while the next
+        page is fetched in the background. Pages aren't stored in a ResourceSet and are cut to its limit.
+        """
+        # Evaluated ResourceSets are iterated as is, chunked ones are requested concurrently in a single go
+        if self._resources is not None or self._is_chunked():
+            for resource in self._evaluate():
+                yield resource
+            return
+
+        params = self._params()
+        limit = params['limit']
+        self._is_sliced = False
+        count = 0
+
+        try:
+            for page in self.manager.facepp.engine.iter_pages(
+                    'post', self.query.url, self.query.container, **params):
+                for resource in page:
+                    if limit and count >= limit:
+                        return
+                    count += 1
+                    yield resource
+        except exceptions.ResourceNotFoundError as e:
+            raise self._requirements_error(e)
+
+    def stream(self):
+        """
+        Returns requested resources in a lazy fashion page by page, the next page is prefetched in the
+        background. Resources aren't stored, so memory stays bounded at any limit and each call requests
+        them from FacePP again.
+        """
+        return (self._to_resource(resource) for resource in self._stream())
+
+    def __iter__(self):
+        """
+        Returns requested resources in a lazy fashion.
+        """
+        return (self._to_resource(resource) for resource in self._evaluate())
 
     def __len__(self):
         """
         Allows len() to be called on a ResourceSet object.
         """
-        return sum(1 for _ in self)
+        return len(self._evaluate())
 
     def __repr__(self):
         """
@@ -119,7 +202,7 @@ class ResourceSet(BaseResourceSet):
         :type resource_id: int or string
         :param none default: (optional). What to return if Resource wasn't found.
         """
-        for resource in super(ResourceSet, self).__iter__():
+        for resource in self._evaluate():
             if resource_id == resource[self.manager.resource_class.internal_id_key]:
                 return self.manager.to_resource(resource)
 
@@ -148,9 +231,102 @@ class ResourceSet(BaseResourceSet):
         for resource in self:
             resource.delete()
 
-        self._resources = None
+        # ResourceSet without a query can't be requested again, all of its resources are gone
+        self._resources = None if self.query else []
         return True
 
+    def prefetch(self, attributes=None, landmark=None):
+        """
+        Fetches attributes and landmark of all resources in a ResourceSet up front. Resource ids are packed
+        into as few filter requests as FacePP allows and these requests are made concurrently.
+
+        :param attributes: (optional). Attribute names to fetch, i.e. ['age', 'emotion'].
+        :type attributes: list or tuple
+        :param int landmark: (optional). Landmark points to fetch, i.e. 1 or 2.
+        """
+        resource_class = self.manager.resource_class
+
+        if resource_class.query_filter is None:
+            raise exceptions.ResourceBadMethodError
+
+        filters = {}
+
+        if attributes:
+            filters['return_attributes'] = list(attributes)
+        if landmark is not None:
+            if not str(landmark).isdigit():
+                raise exceptions.ValidationError('landmark should be a number to be fetched by resource ids')
+            filters['return_landmark'] = landmark
+
+        if not filters:
+            raise exceptions.ResourceNoFiltersProvidedError
+
+        returned = [resource_class._includes_map.get(attr, attr) for attr in attributes or []]
+        resources = {}
+
+        for resource in self._evaluate():
+            if landmark is None or 'landmark' in resource:
+                if all(attr in (resource.get('attributes') or {}) for attr in returned):
+                    continue
+            resources.setdefault(resource[resource_class.internal_id_key], []).append(resource)
+
+        if not resources:
+            return self
+
+        filters[resource_class.internal_id_key + 's'] = list(resources)
+
+        for fetched in self.manager.new_manager(resource_class.__name__).filter(**filters).values():
+            for resource in resources.get(fetched.get(resource_class.internal_id_key), []):
+                if fetched.get('attributes'):
+                    resource['attributes'] = dict(resource.get('attributes') or {}, **fetched['attributes'])
+                if 'landmark' in fetched:
+                    resource['landmark'] = fetched['landmark']
+
+        return self
+
+    def records(self, *fields):
+        """
+        Returns ResourceSet as an iterable of lightweight read-only records. Records are namedtuples
+        built straight from resources data, they don't reference a manager and don't encode values.
+
+        :param fields: (optional). Iterable which sets field names each record will contain, fields
+                       that are missing on the resource are looked up in its attributes.
+        :type fields: list or tuple
+        """
+        resource_class = self.manager.resource_class
+        fields = tuple(fields or resource_class._record or [resource_class.internal_id_key])
+        key = (resource_class.__name__, fields)
+
+        record = records_classes.get(key)
+        if record is None:
+            record = records_classes.setdefault(key, collections.namedtuple(
+                str('{0}Record'.format(resource_class.__name__)), [str(field) for field in fields]))
+
+        for resource in self._evaluate():
+            attributes = resource.get('attributes') or {}
+            yield record(*[jsonlib.unwrap(resource[field]) if field in resource else attributes.get(field)
+                           for field in fields])
+
+    def to_arrays(self, *fields):
+        """
+        Returns ResourceSet as a FaceFrame with a contiguous NumPy array per field, arrays are built
+        straight from resources data without creating Resource objects. Requires NumPy to be installed.
+
+        :param fields: (optional). Iterable which sets field names to export, defaults to all supported fields.
+        :type fields: list or tuple
+        """
+        from . import arrays  # NumPy is imported only when it's needed
+        return arrays.FaceFrame.from_resources(
+            self._evaluate(), fields or sorted(arrays.fields_table), self.manager.resource_class.internal_id_key)
+
+    def landmarks(self):
+        """
+        Returns landmark of all resources in a ResourceSet as a LandmarkBatch with a float32
+        (n_faces, n_points, 2) array, resources without landmark are skipped. Requires NumPy to be installed.
+        """
+        from . import landmarks  # NumPy is imported only when it's needed
+        return landmarks.LandmarkBatch.from_resources(self._evaluate(), self.manager.resource_class.internal_id_key)
+
     def values(self, *fields):
         """
         Returns ResourceSet as an iterable of dictionaries.
@@ -159,11 +335,11 @@ class ResourceSet(BaseResourceSet):
         :type fields: list or tuple
         """
         if fields:
-            for resource in super(ResourceSet, self).__iter__():
-                yield dict((field, resource[field]) for field in fields if field in resource)
+            for resource in self._evaluate():
+                yield dict((field, jsonlib.unwrap(resource[field])) for field in fields if field in resource)
         else:
-            for resource in super(ResourceSet, self).__iter__():
-                yield resource
+            for resource in self._evaluate():
+                yield jsonlib.unwrap(resource)
 
     def values_list(self, *fields, **kwargs):
         """
@@ -177,19 +353,20 @@ class ResourceSet(BaseResourceSet):
 
         if fields:
             if flat and len(fields) == 1:
-                for resource in super(ResourceSet, self).__iter__():
-                    yield resource.get(fields[0])
+                for resource in self._evaluate():
+                    yield jsonlib.unwrap(resource.get(fields[0]))
             else:
-                for resource in super(ResourceSet, self).__iter__():
-                    yield tuple(resource[field] for field in fields if field in resource)
+                for resource in self._evaluate():
+                    yield tuple(jsonlib.unwrap(resource[field]) for field in fields if field in resource)
         else:
-            for resource in super(ResourceSet, self).__iter__():
-                yield tuple(resource.values())
+            for resource in self._evaluate():
+                yield tuple(jsonlib.unwrap(resource).values())
 
-    def __iter__(self):
+    def _to_resource(self, resource):
         """
-        Returns requested resources in a lazy fashion.
+        Converts resource data to Resource object.
+
+        :param dict resource: (required). Resource data.
         """
-        return (self.manager.to_resource(dict(
-            resource, **self.manager.params)) for resource in super(ResourceSet, self).__iter__())
+        return self.manager.to_resource(dict(resource, **self.query.params) if self.query else resource)
 
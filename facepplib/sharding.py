@@ -0,0 +1,358 @@
+"""
+Provides a virtual faceset that spreads faces over a family of physical facesets.
+"""
+
+import math
+import sys
+import threading
+
+from . import exceptions
+
+
+class VirtualFaceSet(object):
+    """
+    Virtual faceset that owns physical facesets named by outer id prefix and shard number, i.e. gallery-0,
+    gallery-1 and so on. Shards are created on demand, new faces are placed on the least full shard and
+    shard occupancy is tracked locally, so placement doesn't need getdetail requests.
+    """
+    chunk = 5  # Max number of face tokens FacePP accepts in a single addface/removeface request
+    attempts = 3  # Max number of shards a chunk of faces is tried on when FacePP rejects it for quota
+
+    def __init__(self, facepp, prefix, capacity=10000, separator='-', **fields):
+        """
+        :param facepp.FacePP facepp: (required). FacePP object.
+        :param string prefix: (required). Outer id prefix of the shards.
+        :param int capacity: (optional). Max number of faces in a single shard.
+        :param string separator: (optional). Separator between the prefix and the shard number.
+        :param dict fields: (optional). Fields used for shards creation, i.e. display_name or tags.
+        """
+        self.facepp = facepp
+        self.prefix = prefix
+        self.capacity = capacity
+        self.separator = separator
+        self.fields = fields
+        self.counts = None
+        self.full = set()
+        self.creating = None  # (outer_id, threading.Event) of the shard being created
+        self.lock = threading.RLock()
+
+    def _outer_id(self, number):
+        """
+        Returns outer id of the shard by its number.
+
+        :param int number: (required). Shard number.
+        """
+        return '{0}{1}{2}'.format(self.prefix, self.separator, number)
+
+    def _number(self, outer_id):
+        """
+        Returns number of the shard by its outer id or None if the faceset isn't a shard.
+
+        :param string outer_id: (required). FaceSet outer id.
+        """
+        head = self.prefix + self.separator
+        if outer_id and outer_id.startswith(head) and outer_id[len(head):].isdigit():
+            return int(outer_id[len(head):])
+        return None
+
+    def _request(self, operation, **data):
+        """
+        Makes a request to the faceset operation and returns processed response.
+
+        :param string operation: (required). FaceSet operation, i.e. addface.
+        :param dict data: (optional). Request data.
+        """
+        return self.facepp.engine.request('post', self.facepp.url + '/facepp/v3/faceset/' + operation, data=data)
+
+    def load(self):
+        """
+        Discovers existing shards and their occupancy, the local mirror is used while it's fresh.
+        """
+        mirror = self.facepp.mirror
+
+        if mirror is not None and mirror.is_fresh():
+            counts = dict((outer_id, count) for outer_id, count in mirror.face_counts(self.prefix).items()
+                          if self._number(outer_id) is not None)
+        else:
+            outer_ids = [faceset.get('outer_id') for faceset in self.facepp.face_set.all(limit=sys.maxsize).values()]
+            outer_ids = [outer_id for outer_id in outer_ids if self._number(outer_id) is not None]
+            counts = dict(zip(outer_ids, self.facepp.engine.map(
+                lambda outer_id: self._request('getdetail', outer_id=outer_id)['face_count'], outer_ids)))
+
+        with self.lock:
+            self.counts = counts
+            self.full = set()
+
+        return self
+
+    @property
+    def shards(self):
+        """
+        Returns outer ids of the shards ordered by shard number.
+        """
+        if self.counts is None:
+            self.load()
+
+        return sorted(self.counts, key=self._number)
+
+    @property
+    def face_count(self):
+        """
+        Returns total number of faces in all shards.
+        """
+        if self.counts is None:
+            self.load()
+
+        return sum(self.counts.values())
+
+    def _create_shard(self):
+        """
+        Creates a new shard unless another thread is creating one already, and waits until it's created.
+        The create request is made without the lock held, the shard is published under the lock.
+        """
+        with self.lock:
+            creating = self.creating
+            if creating is None:
+                outer_id = self._outer_id(max([self._number(outer_id) for outer_id in self.counts] or [-1]) + 1)
+                creating = self.creating = (outer_id, threading.Event())
+            else:
+                outer_id = None
+
+        # Another thread creates the shard, reservation is retried when it's published
+        if outer_id is None:
+            creating[1].wait()
+            return
+
+        try:
+            try:
+                self.facepp.face_set.create(outer_id=outer_id, **self.fields)
+            except exceptions.FacesetExist:
+                pass  # shard was created by another process, it's used as is
+
+            with self.lock:
+                self.counts.setdefault(outer_id, 0)
+        finally:
+            with self.lock:
+                self.creating = None
+            creating[1].set()
+
+    def _reserve(self, size):
+        """
+        Reserves room for faces on the least full shard that fits them and returns its outer id.
+
+        :param int size: (required). Number of faces.
+        """
+        if self.counts is None:
+            self.load()
+
+        while True:
+            with self.lock:
+                shards = [(count, self._number(outer_id), outer_id) for outer_id, count in self.counts.items()
+                          if count + size <= self.capacity and outer_id not in self.full]
+                if shards:
+                    outer_id = min(shards)[2]
+                    self.counts[outer_id] += size
+                    return outer_id
+
+            self._create_shard()
+
+    def _release(self, outer_id, size):
+        """
+        Releases room that was reserved for faces or taken by removed faces on the shard.
+
+        :param string outer_id: (required). Shard outer id.
+        :param int size: (required). Number of faces.
+        """
+        with self.lock:
+            self.counts[outer_id] -= size
+            if size > 0:
+                self.full.discard(outer_id)
+
+    def _change_faces(self, operation, outer_id, face_tokens):
+        """
+        Adds faces to or removes them from the shard, returns a list of face tokens that weren't rejected
+        and the number of faces that were actually changed according to FacePP.
+
+        :param string operation: (required). Either addface or removeface.
+        :param string outer_id: (required). Shard outer id.
+        :param list face_tokens: (required). Face tokens.
+        """
+        response = self._request(operation, outer_id=outer_id, face_tokens=','.join(face_tokens))
+        failed = set(detail.get('face_token') for detail in response.get('failure_detail') or [])
+        changed = [token for token in face_tokens if token not in failed]
+
+        if self.facepp.mirror is not None and response.get('faceset_token'):
+            if operation == 'addface':
+                self.facepp.mirror.add_faces(response['faceset_token'], changed)
+            else:
+                self.facepp.mirror.remove_faces(response['faceset_token'], changed)
+
+        return changed, response.get('face_added', response.get('face_removed', len(changed)))
+
+    def add_faces(self, face_tokens):
+        """
+        Adds faces to the least full shards, creating new shards if needed, and returns a dict with outer id of
+        the shard by face token. Faces are sent in chunks that are placed concurrently.
+
+        :param list face_tokens: (required). Face tokens.
+        """
+        face_tokens = list(face_tokens)
+
+        def add(chunk):
+            for attempt in range(self.attempts):
+                outer_id = self._reserve(len(chunk))
+                try:
+                    added, count = self._change_faces('addface', outer_id, chunk)
+                except exceptions.FaceQuotaExceeded:
+                    # FacePP quota of the shard is lower than the capacity, it's skipped until faces are removed,
+                    # chunk is rejected after a few shards, since the quota may not be the shard's one
+                    with self.lock:
+                        self.counts[outer_id] -= len(chunk)
+                        self.full.add(outer_id)
+                    if attempt + 1 == self.attempts:
+                        raise
+                    continue
+                except Exception:
+                    self._release(outer_id, len(chunk))
+                    raise
+
+                self._release(outer_id, len(chunk) - count)
+                return dict((token, outer_id) for token in added)
+
+        placement = {}
+        for placed in self.facepp.engine.map(add, [face_tokens[i:i + self.chunk]
+                                                   for i in range(0, len(face_tokens), self.chunk)]):
+            placement.update(placed)
+        return placement
+
+    def remove_faces(self, face_tokens, outer_id=None):
+        """
+        Removes faces from the given shard or from all shards, shards of faces are looked up in the local
+        mirror while it's fresh. Returns number of removed faces.
+
+        :param list face_tokens: (required). Face tokens.
+        :param string outer_id: (optional). Outer id of the shard faces are in.
+        """
+        mirror = self.facepp.mirror
+        shards = {}
+
+        for token in face_tokens:
+            if outer_id is not None:
+                outer_ids = [outer_id]
+            elif mirror is not None and mirror.is_fresh():
+                outer_ids = [faceset['outer_id'] for faceset in mirror.facesets_of(token)
+                             if self._number(faceset['outer_id']) is not None]
+            else:
+                outer_ids = self.shards
+            for shard in outer_ids:
+                shards.setdefault(shard, []).append(token)
+
+        moves = [(shard, tokens[i:i + self.chunk]) for shard, tokens in shards.items()
+                 for i in range(0, len(tokens), self.chunk)]
+
+        def remove(shard, chunk):
+            count = self._change_faces('removeface', shard, chunk)[1]
+            self._release(shard, count)
+            return count
+
+        return sum(self.facepp.engine.map(remove, *zip(*moves))) if moves else 0
+
+    def _face_tokens(self, outer_id):
+        """
+        Returns face tokens of the shard, the local mirror is used while it's fresh.
+
+        :param string outer_id: (required). Shard outer id.
+        """
+        mirror = self.facepp.mirror
+
+        if mirror is not None and mirror.is_fresh():
+            faceset = mirror.faceset(outer_id=outer_id)
+            if faceset is not None:
+                return faceset['face_tokens']
+
+        return [token for page, _ in self.facepp.engine.pages(
+            'post', self.facepp.url + '/facepp/v3/faceset/getdetail', 'face_tokens',
+            outer_id=outer_id, limit=self.capacity) for token in page]
+
+    def rebalance(self, tolerance=0):
+        """
+        Moves faces from the shards that have more faces than the average to the shards that have less.
+        Moves run concurrently and each face is added to its new shard before it's removed from the old
+        one, so faces stay searchable during rebalancing. Returns number of moved faces.
+
+        :param int tolerance: (optional). Number of faces a shard may have above the average without moving them.
+        """
+        if self.counts is None:
+            self.load()
+
+        with self.lock:
+            counts = dict(self.counts)
+
+        if len(counts) < 2:
+            return 0
+
+        target = int(math.ceil(float(sum(counts.values())) / len(counts)))
+        surplus = dict((outer_id, count - target) for outer_id, count in counts.items()
+                       if count > target + tolerance)
+        deficit = [[outer_id, target - count] for outer_id, count in sorted(counts.items(), key=lambda item: item[1])
+                   if count < target]
+
+        sources = [outer_id for outer_id in self.shards if outer_id in surplus]
+        tokens = dict(zip(sources, self.facepp.engine.map(self._face_tokens, sources)))
+        moves = []
+
+        for source in sources:
+            pending = tokens[source][-surplus[source]:]
+            while pending and deficit:
+                size = min(deficit[0][1], len(pending), self.chunk)
+                moves.append((source, deficit[0][0], pending[:size]))
+                pending = pending[size:]
+                deficit[0][1] -= size
+                if not deficit[0][1]:
+                    deficit.pop(0)
+
+        def move(source, destination, chunk):
+            # Room is reserved on the destination, so concurrent adds don't overfill it
+            with self.lock:
+                room = 0 if destination in self.full else self.capacity - self.counts[destination]
+                chunk = chunk[:max(room, 0)]
+                self.counts[destination] += len(chunk)
+            if not chunk:
+                return 0
+
+            try:
+                added, count = self._change_faces('addface', destination, chunk)
+            except Exception:
+                self._release(destination, len(chunk))
+                raise
+
+            self._release(destination, len(chunk) - count)
+            if not added:
+                return 0
+            count = self._change_faces('removeface', source, added)[1]
+            self._release(source, count)
+            return count
+
+        return sum(self.facepp.engine.map(move, *zip(*moves))) if moves else 0
+
+    def search(self, **params):
+        """
+        Searches a face in all shards, see SearchManager.sharded() for the parameters.
+
+        :param dict params: (optional). Search parameters, i.e. image_url and return_result_count.
+        """
+        return self.facepp.search.sharded(outer_ids=self.shards, **params)
+
+    def __len__(self):
+        """
+        Allows len() to be called on a VirtualFaceSet object, returns the number of shards.
+        """
+        return len(self.shards)
+
+    def __repr__(self):
+        """
+        Official representation of a VirtualFaceSet object, shards aren't loaded for it.
+        """
+        counts = self.counts
+        return '<facepplib.sharding.VirtualFaceSet object {0} {1}>'.format(
+            self.prefix, 'not loaded' if counts is None else 'with {0} shards'.format(len(counts)))
@@ -0,0 +1,182 @@
+"""
+Provides polling of asynchronous FacePP tasks.
+"""
+
+import threading
+import time
+
+from concurrent import futures
+
+from . import exceptions
+
+
+class Task(object):
+    """
+    Handle of an asynchronous FacePP task.
+    """
+    def __init__(self, task_id, future):
+        """
+        :param string task_id: (required). Task id.
+        :param futures.Future future: (required). Future that is resolved with task status response.
+        """
+        self.task_id = task_id
+        self.future = future
+
+    def done(self):
+        """
+        Checks whether the task is finished.
+        """
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """
+        Waits until the task is finished and returns task status response.
+
+        :param float timeout: (optional). Max number of seconds to wait.
+        """
+        return self.future.result(timeout)
+
+    def add_done_callback(self, callback):
+        """
+        Calls callback with the task when it's finished, callback is called immediately if it's finished already.
+
+        :param callback: (required). Callable that accepts Task object.
+        """
+        self.future.add_done_callback(lambda future: callback(self))
+
+    def __repr__(self):
+        """
+        Official representation of a Task object.
+        """
+        return '<facepplib.tasks.Task object {0} {1}>'.format(self.task_id, 'done' if self.done() else 'pending')
+
+
+class TaskPoller(object):
+    """
+    Polls statuses of all outstanding tasks of a FacePP object from a single background thread. Tasks that are
+    due are polled together in a round of concurrent requests, and each task's poll interval grows while
+    it stays in progress, so long tasks cost few requests and short tasks finish quickly. Polls that fail with
+    a transient error, i.e. a connection error or CONCURRENCY_LIMIT_EXCEEDED, are retried the same way.
+    """
+    url = '/facepp/v3/faceset/async/task_status'
+    # Poll errors that fail the task, it won't finish by polling it again
+    terminal = (exceptions.InvalidTaskId, exceptions.AuthenticationError, exceptions.InsufficientPermission,
+                exceptions.MissingArguments, exceptions.BadArguments, exceptions.ApiNotFound)
+
+    def __init__(self, facepp, min_interval=0.5, max_interval=10, backoff=1.5):
+        """
+        :param facepp.FacePP facepp: (required). FacePP object.
+        :param float min_interval: (optional). Seconds between submission and the first poll of a task.
+        :param float max_interval: (optional). Max seconds between polls of a task.
+        :param float backoff: (optional). Factor the poll interval of a task grows by after each poll.
+        """
+        self.facepp = facepp
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.tasks = {}  # task id: [future, next poll time, poll interval]
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def submit(self, task_id, callback=None):
+        """
+        Starts polling the task and returns its Task handle.
+
+        :param string task_id: (required). Task id returned by FacePP.
+        :param callback: (optional). Callable that accepts Task object, it's called when the task is finished.
+        """
+        task = Task(task_id, futures.Future())
+        if callback is not None:
+            task.add_done_callback(callback)
+
+        with self.condition:
+            self.tasks[task_id] = [task.future, time.time() + self.min_interval, self.min_interval]
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='facepp-tasks')
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify()
+
+        return task
+
+    def __len__(self):
+        """
+        Allows len() to be called on a TaskPoller object, returns the number of outstanding tasks.
+        """
+        return len(self.tasks)
+
+    def _poll(self, task_id):
+        """
+        Returns status response of the task.
+
+        :param string task_id: (required). Task id.
+        """
+        return self.facepp.engine.request('post', self.facepp.url + self.url, data={'task_id': task_id})
+
+    def _reschedule(self, task_id):
+        """
+        Schedules the next poll of the task after a grown poll interval.
+
+        :param string task_id: (required). Task id.
+        """
+        with self.condition:
+            state = self.tasks.get(task_id)
+            if state is not None:
+                state[2] = min(state[2] * self.backoff, self.max_interval)
+                state[1] = time.time() + state[2]
+
+    def _round(self, due):
+        """
+        Polls due tasks concurrently and resolves futures of the finished ones.
+
+        :param list due: (required). Ids of the tasks to poll.
+        """
+        finished = []
+
+        for task_id, (response, error) in zip(due, self.facepp.engine.settle(self._poll, due)):
+            if error is None and response.get('status') != 1 or \
+                    error is not None and not isinstance(error, self.terminal):
+                self._reschedule(task_id)
+                continue
+
+            with self.condition:
+                future = self.tasks.pop(task_id)[0]
+            finished.append((future, response, error))
+
+        # Futures are resolved outside of the lock because done callbacks run in this thread
+        for future, response, error in finished:
+            if future.cancelled():
+                continue
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(response)
+
+    def _run(self):
+        """
+        Polls due tasks in rounds until there are no outstanding tasks.
+        """
+        try:
+            while True:
+                with self.condition:
+                    while True:
+                        if not self.tasks:
+                            self.thread = None
+                            return
+                        now = time.time()
+                        due = [task_id for task_id, (_, polled_at, _) in self.tasks.items() if polled_at <= now]
+                        if due:
+                            break
+                        self.condition.wait(min(polled_at for _, polled_at, _ in self.tasks.values()) - now)
+
+                try:
+                    self._round(due)
+                except Exception:
+                    # A round that failed as a whole is retried, outstanding tasks are still polled
+                    for task_id in due:
+                        self._reschedule(task_id)
+        finally:
+            # The next submitted task starts a new thread if this one is stopped by an error
+            with self.condition:
+                if self.thread is threading.current_thread():
+                    self.thread = None
@@ -0,0 +1,243 @@
+"""
+Provides adaptive choice of the form images are sent to FacePP in: image_url, image_file or image_base64.
+"""
+
+import base64
+import binascii
+import io
+import os
+import threading
+import time
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:  # Python 2
+    from urlparse import urlsplit
+
+from . import exceptions, fetch
+
+# Image inputs of a request by image, i.e. image_url1, image_file1 and image_base64_1 are the first image of compare
+images = (('image_url', 'image_file', 'image_base64', 'image'),
+          ('image_url1', 'image_file1', 'image_base64_1', 'image1'),
+          ('image_url2', 'image_file2', 'image_base64_2', 'image2'))
+
+signatures = ((b'\xff\xd8', 'image/jpeg'), (b'\x89PNG', 'image/png'), (b'GIF8', 'image/gif'), (b'BM', 'image/bmp'))
+
+
+def sniff(content):
+    """
+    Returns mime type of the image by its first bytes.
+
+    :param bytes content: (required). Image bytes.
+    """
+    for signature, mime in signatures:
+        if content.startswith(signature):
+            return mime
+    return 'application/octet-stream'
+
+
+class TransportPolicy(object):
+    """
+    Chooses per request how each image is sent to FacePP. Base64 inputs are uploaded as multipart files that
+    are a third smaller, and URL inputs are fetched by the client and uploaded when FacePP was observed to
+    download images of the host slower than the client fetches and uploads them. Upload bandwidth, server-side
+    fetch latency of each host and server processing time of each endpoint are measured from the responses.
+    """
+    def __init__(self, fetcher=None, bandwidth=1024 * 1024, margin=1.5, smoothing=0.3, timeout_penalty=60):
+        """
+        :param fetch.ImageFetcher fetcher: (optional). Downloader of URL inputs that are uploaded, defaults to the
+                                           image fetcher of the engine.
+        :param float bandwidth: (optional). Upload bandwidth in bytes per second assumed until it's measured.
+        :param float margin: (optional). How many times slower FacePP should fetch an image than the client
+                             fetches and uploads it for the image to be uploaded.
+        :param float smoothing: (optional). Weight of a new measurement in moving averages.
+        :param float timeout_penalty: (optional). Seconds recorded as fetch latency of a host FacePP timed out on.
+        """
+        self.fetcher = fetcher
+        self.bandwidth = bandwidth
+        self.margin = margin
+        self.smoothing = smoothing
+        self.timeout_penalty = timeout_penalty
+        self.server_fetch = {}  # host: seconds FacePP takes to download an image
+        self.client_fetch = {}  # host: seconds client takes to download an image
+        self.sizes = {}  # host: image size in bytes
+        self.processing = {}  # endpoint path: seconds FacePP takes to process uploaded images
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_option(cls, option):
+        """
+        Returns TransportPolicy object or None from the image_transport engine option.
+
+        :param option: (required). True, TransportPolicy options, TransportPolicy object or None.
+        :type option: bool, dict, TransportPolicy or None
+        """
+        if not option or isinstance(option, cls):
+            return option or None
+        return cls(**option) if isinstance(option, dict) else cls()
+
+    def _smooth(self, table, key, value):
+        """
+        Updates moving average of the key with a new measurement.
+
+        :param dict table: (required). Moving averages.
+        :param any key: (required). Key.
+        :param float value: (required). Measurement.
+        """
+        with self.lock:
+            old = table.get(key)
+            table[key] = value if old is None else old + self.smoothing * (value - old)
+
+    def _fetch(self, url, instrumentation):
+        """
+        Fetches the image and measures client download latency and image size of its host.
+
+        :param string url: (required). Image url.
+        :param instrumentation.Instrumentation instrumentation: (required). Instrumentation of the engine.
+        """
+        cached = url in self.fetcher.cache
+        started = time.time()
+        image = self.fetcher.fetch(url, instrumentation)
+
+        if image is not None and not cached:
+            host = fetch.host(url)
+            self._smooth(self.client_fetch, host, time.time() - started)
+            self._smooth(self.sizes, host, len(image[1].getvalue()))
+
+        return image
+
+    def _url_costs(self, url):
+        """
+        Returns estimated seconds FacePP takes to fetch the image and seconds client takes to fetch and upload
+        it, a cost is None until it's measured.
+
+        :param string url: (required). Image url.
+        """
+        host = fetch.host(url)
+        cached = self.fetcher.cache.get(url)
+
+        with self.lock:
+            server = self.server_fetch.get(host)
+            size = len(cached[1]) if cached is not None else self.sizes.get(host)
+            client = 0 if cached is not None else self.client_fetch.get(host)
+            bandwidth = self.bandwidth
+
+        return server, None if client is None or size is None else client + size / float(bandwidth)
+
+    def choose(self, engine, data):
+        """
+        Returns request data with images in the chosen form and a list of choices, each is a dict with input
+        name, chosen transport, original transport, payload size in bytes and estimated cost in seconds.
+
+        :param engines.BaseEngine engine: (required). Engine the request is made with.
+        :param dict data: (required). Request data.
+        """
+        data, choices = dict(data), []
+
+        for url_name, file_name, base64_name, input_name in images:
+            url, path, encoded = data.get(url_name), data.get(file_name), data.get(base64_name)
+            choice = None
+
+            if encoded:
+                try:
+                    content = base64.b64decode(encoded)
+                except (binascii.Error, TypeError, ValueError):
+                    content = None
+                if content is not None:
+                    del data[base64_name]
+                    data[file_name] = ('image', io.BytesIO(content), sniff(content))
+                    choice = dict(transport='file', source='base64', size=len(content))
+            elif isinstance(path, tuple):
+                choice = dict(transport='file', source='file', size=None)
+            elif path:
+                choice = dict(transport='file', source='file', size=os.path.getsize(path))
+            elif url:
+                server, client = self._url_costs(url)
+                choice = dict(transport='url', source='url', size=None, cost=server, image_url=url)
+
+                # Hosts FacePP is slow for are fetched once before client latency of the host is measured
+                if server is not None and (server > client * self.margin if client is not None else
+                                           server >= self.fetcher.slow):
+                    image = self._fetch(url, engine.instrumentation)
+                    if image is not None:
+                        del data[url_name]
+                        data[file_name] = image
+                        choice = dict(transport='file', source='url', size=len(image[1].getvalue()))
+
+            if choice is not None:
+                choice['input'] = input_name
+                if 'cost' not in choice:
+                    choice['cost'] = choice['size'] / float(self.bandwidth) if choice['size'] is not None else None
+                choices.append(choice)
+
+        return data, choices
+
+    def measure(self, url, choices, elapsed, response):
+        """
+        Updates measurements with a response of a request made with the chosen transports.
+
+        :param string url: (required). URL of the request.
+        :param list choices: (required). Choices returned by choose().
+        :param float elapsed: (required). Seconds the request took.
+        :param any response: (required). Processed response.
+        """
+        time_used = response.get('time_used') if isinstance(response, dict) else None
+        if time_used is None:
+            return
+
+        server = time_used / 1000.0
+        path = urlsplit(url).path
+        urls = [choice['image_url'] for choice in choices if choice['transport'] == 'url']
+        uploaded = sum(choice['size'] or 0 for choice in choices if choice['transport'] == 'file')
+
+        if urls:
+            with self.lock:
+                processing = self.processing.get(path)
+            # Fetch latency is only known once the endpoint was measured processing uploaded images, until then
+            # all server time would be booked as fetch latency and hosts would look slow
+            if processing is not None:
+                for image in urls:
+                    self._smooth(self.server_fetch, fetch.host(image), max(server - processing, 0))
+        else:
+            self._smooth(self.processing, path, server)
+
+        if uploaded and elapsed > server:
+            with self.lock:
+                self.bandwidth += self.smoothing * (uploaded / (elapsed - server) - self.bandwidth)
+
+    def request(self, engine, method, url, headers, params, data):
+        """
+        Makes a request to FacePP with engine, images are sent in the chosen form and the choices are emitted
+        as image.transport events with their cost.
+
+        :param engines.BaseEngine engine: (required). Engine the request is made with.
+        :param string method: (required). HTTP verb to use for the request.
+        :param string url: (required). URL of the request.
+        :param dict headers: (required). HTTP headers to send with the request.
+        :param dict params: (required). Params to send in the query string.
+        :param dict data: (required). Request data with api key and secret.
+        """
+        data, choices = self.choose(engine, data)
+
+        for choice in choices:
+            engine.instrumentation.count('transport.' + choice['transport'])
+            engine.instrumentation.emit('image.transport', url=url, **choice)
+
+        started = time.time()
+
+        try:
+            response = engine._request_images(method, url, headers, params, data)
+        except exceptions.ImageDownloadTimeout:
+            for choice in choices:
+                if choice['transport'] == 'url':
+                    self._smooth(self.server_fetch, fetch.host(choice['image_url']), self.timeout_penalty)
+            raise
+
+        self.measure(url, choices, time.time() - started, response)
+        return response
+
+    def __repr__(self):
+        """
+        Official representation of a TransportPolicy object.
+        """
+        return '<facepplib.transport.TransportPolicy object {0:.0f} bytes/s>'.format(self.bandwidth)
@@ -2,10 +2,18 @@
 Provides helper utilities.
 """
 
-import copy
+import collections
 import functools
+import itertools
+import re
 import string
 import sys
+import threading
+
+try:
+    import contextvars
+except ImportError:  # Python < 3.7
+    contextvars = None
 
 
 def fix_unicode(cls):
@@ -47,22 +55,27 @@ def with_metaclass(meta, *bases):
     return type.__new__(MetaClass, 'temporary_class', (), {})
 
 
-def merge_dicts(a, b):
+def parse_version(version):
     """
-    Merges dicts a and b recursively into a new dict.
+    Returns a tuple of numeric components of the version that can be compared with other versions.
 
-    :param dict a: (required).
-    :param dict b: (required).
+    :param string version: (required). Version, i.e. 3.0.
     """
-    result = copy.deepcopy(a)
+    return tuple(int(part) for part in re.findall(r'\d+', str(version)))
 
-    for key, value in b.items():
-        if isinstance(value, dict):
-            result[key] = merge_dicts(value, a.get(key, {}))
-        else:
-            result[key] = value
 
-    return result
+def split_tokens(tokens):
+    """
+    Returns a list of tokens from a list or a comma separated string.
+
+    :param tokens: (required). Tokens.
+    :type tokens: list, tuple or string
+    """
+    if not tokens:
+        return []
+    if not isinstance(tokens, (list, tuple)):
+        tokens = tokens.split(',')
+    return [token.strip() for token in tokens if token.strip()]
 
 
 class MemorizeFormatter(string.Formatter):
@@ -79,3 +92,133 @@ class MemorizeFormatter(string.Formatter):
                 self.used_kwargs[item] = kwargs.pop(item)
 
         self.unused_kwargs = kwargs
+
+
+class LRUCache(object):
+    """
+    Thread-safe mapping that keeps up to maxsize most recently used items.
+    """
+    def __init__(self, maxsize=10000):
+        """
+        :param int maxsize: (optional). Max number of items, 0 disables caching.
+        """
+        self.maxsize = maxsize
+        self.items = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns item by key and marks it as recently used.
+
+        :param any key: (required). Item key.
+        :param any default: (optional). What to return if item isn't cached.
+        """
+        with self.lock:
+            try:
+                value = self.items.pop(key)
+            except KeyError:
+                return default
+            self.items[key] = value
+            return value
+
+    def set(self, key, value):
+        """
+        Caches item, the least recently used item is dropped if cache is full.
+
+        :param any key: (required). Item key.
+        :param any value: (required). Item value.
+        """
+        if not self.maxsize:
+            return
+
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = value
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        """
+        Drops all items.
+        """
+        with self.lock:
+            self.items.clear()
+
+    def __contains__(self, key):
+        """
+        Checks whether item is cached.
+        """
+        return key in self.items
+
+    def __len__(self):
+        """
+        Allows len() to be called on a LRUCache object.
+        """
+        return len(self.items)
+
+
+# A single context variable holds values of all ContextLocal objects by their keys, since context variables
+# are never garbage collected and would be referenced from every context copied after they were set
+context = contextvars.ContextVar('facepp_context') if contextvars is not None else None
+context_keys = itertools.count()
+
+
+class ContextLocal(object):
+    """
+    Value that is local to the current asyncio task or thread. Context variables are used where they are
+    available, so values don't leak between coroutines, otherwise the value is local to the thread.
+    """
+    def __init__(self, name, default=None):
+        """
+        :param string name: (required). Variable name.
+        :param any default: (optional). Value that is returned until it's set.
+        """
+        self.name = name
+        self.default = default
+
+        if contextvars is not None:
+            self._key = next(context_keys)
+        else:
+            self._local = threading.local()
+
+    def get(self):
+        """
+        Returns value of the current context.
+        """
+        if contextvars is not None:
+            return context.get({}).get(self._key, self.default)
+        return getattr(self._local, 'value', self.default)
+
+    def set(self, value):
+        """
+        Sets value of the current context and returns a token that restores the previous value.
+
+        :param any value: (required). Value.
+        """
+        if contextvars is not None:
+            values = dict(context.get({}))
+            token = (self._key in values, values.get(self._key))
+            values[self._key] = value
+            context.set(values)
+            return token
+
+        token = self.get()
+        self._local.value = value
+        return token
+
+    def reset(self, token):
+        """
+        Restores the value that was replaced by set().
+
+        :param any token: (required). Token returned by set().
+        """
+        if contextvars is not None:
+            # Only the value of this object is restored, values other objects set meanwhile are kept
+            values = dict(context.get({}))
+            if token[0]:
+                values[self._key] = token[1]
+            else:
+                values.pop(self._key, None)
+            context.set(values)
+        else:
+            self._local.value = token
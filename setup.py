@@ -16,7 +16,12 @@ setup(name='python-facepp',
       author_email='yanminhui163@163.com',
 
       python_requires='>=2.7, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*',
-      install_requires=['requests>=2.20.0'],
+      install_requires=['requests>=2.20.0', 'futures>=3.0.0; python_version < "3"'],
+      extras_require={
+          'numpy': ['numpy'],
+          'http2': ['httpx[http2]>=0.26; python_version >= "3.8"'],
+          'orjson': ['orjson; python_version >= "3.6"']
+      },
 
       classifiers=[
           'Development Status :: 3 - Alpha',